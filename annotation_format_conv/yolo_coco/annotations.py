@@ -43,3 +43,25 @@ def create_annotation_from_yolo_format(
     }
 
     return annotation
+
+
+def create_annotation_from_rle(
+    rle, bbox, area, image_id, category_id, annotation_id, iscrowd=0
+):
+    """
+    rle: COCO RLE dict {"size": [height, width], "counts": list or compact str}
+         i.e. from encode_coco_rle in common_utils/mask_compression/rle.py
+    bbox: (min_x, min_y, width, height)
+    area: number of foreground pixels in the mask
+    """
+    annotation = {
+        "id": annotation_id,
+        "image_id": image_id,
+        "bbox": tuple(float(v) for v in bbox),
+        "area": area,
+        "iscrowd": iscrowd,
+        "category_id": category_id,
+        "segmentation": rle,
+    }
+
+    return annotation
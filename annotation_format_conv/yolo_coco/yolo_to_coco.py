@@ -15,12 +15,14 @@ Sample Usage:
     python yolo_to_coco.py --rd ../yolo_data_example  --cp ../yolo_data_example/classes.txt --is 0 --op coco.json
 """
 from pathlib import Path
+import os
+import sys
 import argparse
+import os.path as osp
 import json
 import tqdm
 
 import cv2
-import imagesize
 import numpy as np
 
 from annotations import (
@@ -29,6 +31,10 @@ from annotations import (
     coco_format_dict,
 )
 
+sys.path.append(osp.join(osp.dirname(osp.abspath(__file__)), "..", "..", "image_io_utils"))
+from image_reader import read_image  # noqa: E402
+from image_info import ImageInfoCache  # noqa: E402
+
 
 IMG_EXTNS = {".jpg", ".jpeg", ".png"}
 IMAGES_DIR = "images"
@@ -51,13 +57,18 @@ def get_images_info_and_annotations(args):
     annotations = []
     images_annotations = []
     annotation_id = 1  # In COCO dataset format, annotation_id starts with '1'
+    output_dir = osp.dirname(osp.abspath(args.output_json_path))
+    os.makedirs(output_dir, exist_ok=True)
+    info_cache = ImageInfoCache(args.info_cache or osp.join(output_dir, "image_info_cache.sqlite"))
 
     for image_path in tqdm.tqdm(image_paths):
         # image_id follows the format from YOLOv5 val.py json generation
         image_id = int(image_path.stem) if image_path.stem.isnumeric() else image_path.stem
 
         # Build image annotation, known the image's width and height
-        w, h = imagesize.get(str(image_path))
+        info = info_cache.get(str(image_path))
+        # labels are relative to the image as displayed, i.e. after applying the EXIF orientation
+        w, h = info.oriented_size
         image_annotation = create_image_annotation(
             file_path=image_path, width=w, height=h, image_id=image_id
         )
@@ -105,6 +116,7 @@ def get_images_info_and_annotations(args):
             annotations.append(annotation)
             annotation_id += 1
 
+    info_cache.close()
     return images_annotations, annotations
 
 
@@ -130,7 +142,7 @@ def debug_conv(args):
     for image_path in image_paths:
         print("Image Path : ", image_path)
         # read image file
-        img_file = cv2.imread(str(image_path))
+        img_file = read_image(str(image_path), mode="BGR")
 
         # read .txt label file
         label_file_name = f"{image_path.stem}.txt"
@@ -208,6 +220,12 @@ def parser_args():
         default="coco_annot.json", type=str,
         help="Path to the converted COCO JSON annotation output (default: %(default)s)",
     )
+    parser.add_argument(
+        "--ic", "--info_cache", dest="info_cache",
+        default=None, type=str,
+        help="Path to the sqlite cache of probed image sizes, reused on re-runs. "
+        "Use :memory: to not persist it (default: image_info_cache.sqlite next to the output json)",
+    )
     parser.add_argument(
         "--box2seg",
         action="store_true",
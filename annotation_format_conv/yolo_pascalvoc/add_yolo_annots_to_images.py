@@ -1,10 +1,14 @@
 import os
+import sys
 import cv2
 import glob
 import tqdm
 import argparse
 import os.path as osp
 
+sys.path.append(osp.join(osp.dirname(osp.abspath(__file__)), "..", "..", "image_io_utils"))
+from image_reader import read_image  # noqa: E402
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -59,8 +63,7 @@ def add_annots_to_imgs(img_root_dir, annot_root_dir, target_drawn_dir):
         frame_num = osp.basename(img_file).split('.')[0]
         annot_file = f"{annot_root_dir}/" + frame_num + ".txt"
         with open(annot_file, 'r') as annot_ptr:
-            img_cv = cv2.imread(img_file)
-            img_cv = cv2.resize(img_cv, (576 * 2, 360 * 2))
+            img_cv = read_image(img_file, target_size=(576 * 2, 360 * 2), mode="BGR")
             height, width, _ = img_cv.shape
             for line in annot_ptr:
                 line = line.strip().split()
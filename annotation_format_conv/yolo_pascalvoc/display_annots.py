@@ -1,7 +1,13 @@
+import sys
 import cv2
 import argparse
+import os.path as osp
 from utils import cxywh2cxyxy
 
+sys.path.append(osp.join(osp.dirname(osp.abspath(__file__)), "..", "..", "image_io_utils"))
+from image_reader import read_image  # noqa: E402
+from image_cache import add_cache_args, image_cache_from_args  # noqa: E402
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -18,6 +24,7 @@ def parse_args():
                         '--annot_path',
                         default="VOCdevkit/VOC2007/Annotations/COCO_train2014_000000000025.xml",
                         help='Path to annotation file. Must match with the annotation type')
+    add_cache_args(parser)
     args = parser.parse_args()
     return args
 
@@ -66,7 +73,10 @@ def get_txt_annot_for_yolo(annot_path, width, height):
 
 def main():
     args = parse_args()
-    img = cv2.imread(args.image_path)
+    # nothing is written by this tool, the cache is only used with an explicit --cache_dir
+    image_cache = image_cache_from_args(args)
+    read = image_cache.read if image_cache is not None else read_image
+    img = read(args.image_path, mode="BGR")
     height, width, _ = img.shape
 
     if args.annotation_type == "voc":
@@ -1,13 +1,20 @@
 import os
+import sys
 import cv2
 import tqdm
 import random
+import shutil
 import argparse
 import numpy as np
 import os.path as osp
 from lxml.etree import Element, SubElement, tostring
 
 from utils import cxcywh2xyxy
+
+sys.path.append(osp.join(osp.dirname(osp.abspath(__file__)), "..", "..", "image_io_utils"))
+from image_reader import read_image  # noqa: E402
+from image_info import ImageInfoCache, get_image_info  # noqa: E402
+
 random.seed(42)
 
 
@@ -31,6 +38,10 @@ def parse_args():
                         default=0.1,
                         type=float,
                         help='Def: 0.1. Validation portion. If set to 0, no data saved for validation')
+    parser.add_argument('-c',
+                        '--info_cache',
+                        default=None,
+                        help='Def: VOCdevkit/image_info_cache.sqlite. Cache of probed image sizes, reused on re-runs')
     args = parser.parse_args()
     return args
 
@@ -97,13 +108,15 @@ def close_train_val_file_ptr_dict(file_ptr_dict, root_name="VOCdevkit") -> None:
         [f.close() for f in fptrs]
 
 
-def generate_voc_xml(img_id, full_imgpath, label_norm, classes, classes_det_flag_dict):
+def generate_voc_xml(img_id, full_imgpath, label_norm, classes, classes_det_flag_dict, info_cache=None):
     """
     full_imgpath: path to img file
+    info_cache: optional ImageInfoCache, image size is probed from the file header
     """
-    img = cv2.imread(full_imgpath)
+    info = info_cache.get(full_imgpath) if info_cache is not None else get_image_info(full_imgpath)
     img_name = img_id + '.jpg'
-    height, width, channels = img.shape
+    # oriented size matches the size of the image as loaded by cv2.imread
+    width, height = info.oriented_size
 
     node_root = Element('annotation')
     node_folder = SubElement(node_root, 'folder')
@@ -119,7 +132,7 @@ def generate_voc_xml(img_id, full_imgpath, label_norm, classes, classes_det_flag
     node_height = SubElement(node_size, 'height')
     node_height.text = str(height)
     node_depth = SubElement(node_size, 'depth')
-    node_depth.text = str(channels)
+    node_depth.text = '3'  # images are saved as 3 channel jpgs
     node_segmented = SubElement(node_root, 'segmented')
     node_segmented.text = '0'
 
@@ -161,13 +174,17 @@ def save_in_voc_fmt(root,
                     source_img_ext="jpg",
                     target_root_name="VOCdevkit",
                     val_portion=0.10,
-                    save_loaded_imgs=True):
+                    save_loaded_imgs=True,
+                    info_cache_path=":memory:"):
     """
     converts yolo label fmt into xml label
         root: root path with dirs images, labels and class file
         classes: list of class names ordered by idx
         source_img_ext: extension of source images
-        save_loaded_imgs: if images are to re-saved inside VOC2007/JPEGImages
+        save_loaded_imgs: if images are to re-saved inside VOC2007/JPEGImages,
+            jpg source images without EXIF rotation are copied as is,
+            others are decoded upright and re-encoded as jpg
+        info_cache_path: sqlite path of the probed image size cache, :memory: to not persist it
     """
     labelspath = osp.join(root, 'labels')
     labels_list = os.listdir(labelspath)
@@ -193,6 +210,7 @@ def save_in_voc_fmt(root,
     outpath_fmt = osp.join(target_root_name, 'VOC2007',
                            'Annotations', '%s.xml')
 
+    info_cache = ImageInfoCache(info_cache_path)
     random.shuffle(ids_list)
     train_size = int(len(ids_list) * (1 - val_portion))
     for i in tqdm.tqdm(range(len(ids_list))):
@@ -210,7 +228,8 @@ def save_in_voc_fmt(root,
         classes_det_flag_dict = {class_name: -1 for class_name in classes}
         xml = generate_voc_xml(img_id, full_imgpath,
                                label_norm, classes,
-                               classes_det_flag_dict)
+                               classes_det_flag_dict,
+                               info_cache)
 
         # writing to the train, val, trainval txt files for each class
         for class_name, detected in classes_det_flag_dict.items():
@@ -233,13 +252,19 @@ def save_in_voc_fmt(root,
         # write the annotated xml file
         with open(outpath_fmt % img_id, "wb") as fw:
             fw.write(xml)
-        # save the loaded file as jpg file
+        # save the image as jpg file
         if save_loaded_imgs:
-            cv2.imwrite(osp.join(target_root_name, 'VOC2007', 'JPEGImages',
-                                 img_id + '.jpg'), cv2.imread(full_imgpath))
+            target_imgpath = osp.join(target_root_name, 'VOC2007', 'JPEGImages', img_id + '.jpg')
+            # a copy keeps the stored pixels and EXIF orientation, while the xml size is the oriented one,
+            # so rotated jpgs are written upright instead
+            if source_img_ext.lower() in {'jpg', 'jpeg'} and info_cache.get(full_imgpath).orientation == 1:
+                shutil.copyfile(full_imgpath, target_imgpath)
+            else:
+                cv2.imwrite(target_imgpath, read_image(full_imgpath, mode="BGR"))
 
     # close all open pointers for the train,val,trainval files
     close_train_val_file_ptr_dict(train_val_ptr_dict)
+    info_cache.close()
     main_train_ptr.close()
     main_val_ptr.close()
     main_trainval_ptr.close()
@@ -251,7 +276,8 @@ def main():
                     classes=load_classes_from_file(args.label_file),
                     source_img_ext=args.src_img_ext,
                     target_root_name="VOCdevkit",
-                    val_portion=args.valid_portion,)
+                    val_portion=args.valid_portion,
+                    info_cache_path=args.info_cache or osp.join("VOCdevkit", "image_info_cache.sqlite"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+"""
+Bounded producer/consumer frame prefetcher for any frame source
+
+A producer thread pulls frames from the source (e.g. a VideoReader or a cv2.VideoCapture loop)
+into a bounded queue with blocking puts, so decoding runs ahead of the consumer by at most
+queue_size frames. An optional transform (resize, normalization, ...) runs on num_workers threads,
+frames are still returned in source order. The end of the stream is signalled with a sentinel
+and source errors are re-raised in the consumer.
+Sources that yield views of one reused buffer, such as stream_frames_ffmpeg whose next read
+overwrites the previous frames, need copy_frames=True so that queued frames are copies.
+
+stats reports backpressure metrics: the mean and max queue depth seen by the consumer,
+and the time the producer spent blocked on a full queue (consumer is the bottleneck)
+and the consumer spent waiting for frames (decoding or the transform is the bottleneck).
+
+Sample Usage:
+    from video_reader import VideoReader
+    from frame_prefetcher import FramePrefetcher
+
+    with VideoReader("video.mp4") as vr, FramePrefetcher(
+            vr, transform=lambda f: cv2.resize(f, (800, 600)), num_workers=2) as prefetcher:
+        for frame in prefetcher:
+            ...
+        print(prefetcher.stats)
+"""
+import time
+import inspect
+from queue import Queue, Full
+from threading import Event, Thread
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+
+class _EndOfStream:
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+class FramePrefetcher:
+    def __init__(self,
+                 source: Iterable,
+                 transform: Optional[Callable] = None,
+                 num_workers: int = 1,
+                 queue_size: int = 128,
+                 copy_frames: bool = False):
+        """Prefetch frames of source on a background thread into a queue of at most queue_size frames
+            transform: optional func applied to each frame on num_workers threads
+            copy_frames: copy each frame before queueing it, for sources that reuse their output buffer
+                         (e.g. stream_frames_ffmpeg), frames of decoders that allocate one array
+                         per frame (PyAV, decord, OpenCV) are queued without a copy
+        """
+        self.source = source
+        self.transform = transform
+        self.copy_frames = copy_frames
+        self.queue = Queue(maxsize=queue_size)
+        self.stopped = Event()
+        self.executor = ThreadPoolExecutor(max_workers=num_workers) if transform is not None else None
+        self.thread = Thread(target=self._produce, daemon=True)
+        self.finished = False
+
+        self.n_produced = 0
+        self.n_consumed = 0
+        self.producer_stall_s = 0.0
+        self.consumer_stall_s = 0.0
+        self.queue_depth_sum = 0
+        self.max_queue_depth = 0
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _put(self, item) -> bool:
+        """
+        blocking put that wakes up periodically to notice close(), returns False if closed
+        """
+        t1 = time.perf_counter()
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                self.producer_stall_s += time.perf_counter() - t1
+                return True
+            except Full:
+                continue
+        return False
+
+    def _produce(self):
+        error = None
+        try:
+            for frame in self.source:
+                if self.copy_frames:
+                    frame = np.copy(frame)  # the source overwrites its buffer on the next read
+                if self.executor is not None:
+                    # futures keep the source order while the transforms run in parallel
+                    frame = self.executor.submit(self.transform, frame)
+                if not self._put(frame):
+                    return
+                self.n_produced += 1
+        except Exception as excep:
+            error = excep
+        finally:
+            if inspect.isgenerator(self.source):  # e.g. stops the ffmpeg process of stream_frames_ffmpeg
+                self.source.close()
+        self._put(_EndOfStream(error))
+
+    def read(self):
+        """
+        next frame, or None at the end of the stream or after close()
+        """
+        if self.finished or self.stopped.is_set():
+            return None
+        if self.thread.ident is None:
+            self.start()
+        t1 = time.perf_counter()
+        depth = self.queue.qsize()
+        self.queue_depth_sum += depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        item = self.queue.get()
+        if isinstance(item, _EndOfStream):
+            self.finished = True
+            self.consumer_stall_s += time.perf_counter() - t1
+            if item.error is not None:
+                raise item.error
+            return None
+        if self.executor is not None:
+            item = item.result()
+        self.consumer_stall_s += time.perf_counter() - t1
+        self.n_consumed += 1
+        return item
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        frame = self.read()
+        if frame is None:
+            raise StopIteration
+        return frame
+
+    @property
+    def stats(self) -> dict:
+        return {"frames_produced": self.n_produced,
+                "frames_consumed": self.n_consumed,
+                "queue_size": self.queue.maxsize,
+                "mean_queue_depth": self.queue_depth_sum / max(self.n_consumed, 1),
+                "max_queue_depth": self.max_queue_depth,
+                "producer_stall_s": self.producer_stall_s,
+                "consumer_stall_s": self.consumer_stall_s}
+
+    def close(self):
+        """
+        stop the producer and release the transform threads, safe to call before the end of the stream
+        """
+        self.stopped.set()
+        self.finished = True
+        if self.thread.is_alive():
+            self.thread.join()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
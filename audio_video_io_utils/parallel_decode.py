@@ -0,0 +1,148 @@
+"""
+Multi-process video decoding over segments split at keyframes
+
+The video is split into one segment per worker at keyframe boundaries, so each worker starts
+decoding at a keyframe without decoding frames of the previous segment. Workers write frames
+straight into the output, only frame counts are pickled: a multiprocessing.shared_memory block
+that the returned array keeps mapped, or the file of a caller-supplied np.memmap.
+The segments land in order, so the frames are not copied again to reassemble them.
+
+Sample Usage:
+    from parallel_decode import decode_video_parallel
+
+    frames = decode_video_parallel("video.mp4", size=(800, 600), num_workers=4)  # (N, 600, 800, 3)
+"""
+import os
+import mmap
+import ctypes
+import warnings
+from multiprocessing import get_context, shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from video_reader import VideoReader, probe_video, keyframe_indices, _batch_out
+
+
+def split_at_keyframes(keyframes, num_frames: int, num_segments: int) -> List[Tuple[int, int]]:
+    """
+    split [0, num_frames) into up to num_segments (start, end) ranges of similar length
+    starting at keyframes, fewer segments are returned if the video has fewer keyframes
+    """
+    keyframes = np.asarray(keyframes, dtype=np.int64)
+    keyframes = keyframes[(keyframes > 0) & (keyframes < num_frames)]
+    bounds = [0]
+    for target in np.linspace(0, num_frames, num_segments + 1)[1:-1]:
+        if not len(keyframes):
+            break
+        nearest = int(keyframes[np.abs(keyframes - target).argmin()])
+        if nearest > bounds[-1]:
+            bounds.append(nearest)
+    bounds.append(num_frames)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _shm_array(shm: shared_memory.SharedMemory, shape) -> np.ndarray:
+    """
+    uint8 array over a shared memory block, the block stays mapped until the array is freed
+    """
+    # the array is built on a ctypes view of the block's address that holds the SharedMemory,
+    # an array built on shm.buf would keep it exported and SharedMemory.close would fail
+    address = ctypes.addressof(ctypes.c_uint8.from_buffer(shm.buf))
+    holder = (ctypes.c_uint8 * shm.size).from_address(address)
+    holder.shm = shm
+    return np.frombuffer(holder, dtype=np.uint8, count=int(np.prod(shape))).reshape(shape)
+
+
+def _open_frames(target, shape) -> np.ndarray:
+    """
+    frames array of a worker, target is ("shm", name) or ("memmap", filename, offset)
+    """
+    if target[0] == "shm":
+        return _shm_array(shared_memory.SharedMemory(name=target[1]), shape)
+    _, filename, offset = target
+    return np.memmap(filename, dtype=np.uint8, mode="r+", offset=offset, shape=shape)
+
+
+def _decode_segment(path, target, shape, start, end, size, mode, backend) -> int:
+    """
+    decode frames [start, end) into the frames array of target, returns the number of decoded frames
+    """
+    frames = _open_frames(target, shape)
+    n_decoded = 0
+    with VideoReader(path, size, mode, backend) as vr:
+        frame_iter = vr.reader.iter_frames(start)
+        try:
+            for frame in frame_iter:
+                if start + n_decoded >= end:
+                    break
+                frames[start + n_decoded] = frame
+                n_decoded += 1
+        finally:
+            frame_iter.close()
+    if isinstance(frames, np.memmap):
+        frames.flush()
+    return n_decoded
+
+
+def decode_video_parallel(path: str,
+                          size: Optional[Tuple[int, int]] = None,
+                          mode: str = "RGB",
+                          backend: Optional[str] = None,
+                          num_workers: Optional[int] = None,
+                          out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    decode all frames of a video with num_workers processes, one segment per worker
+        size: (width, height) of the output frames, defaults to the video size
+        backend: VideoReader backend used by the workers
+        out: optional preallocated (N, H, W, 3) uint8 array, N being at least the probed frame count,
+             workers write straight into a np.memmap (e.g. np.lib.format.open_memmap),
+             other arrays are filled with one copy from shared memory
+    returns the (N, H, W, 3) frames in order, fewer if the probed frame count was too high
+    without out, the array is backed by shared memory that is freed with the array
+    """
+    info = probe_video(path)
+    width, height = tuple(size) if size is not None else (info.width, info.height)
+    shape = (info.num_frames, height, width, 3)
+    if out is not None:
+        _batch_out(info.num_frames, (width, height), out[:info.num_frames])  # checks the shape
+    num_workers = num_workers or os.cpu_count() or 1
+    try:
+        keyframes = keyframe_indices(path, info)
+    except Exception as excep:
+        # decoders start at the keyframe before each segment, even splits only decode a few extra frames
+        warnings.warn(f"Could not list the keyframes of {path}, splitting evenly: {excep}")
+        keyframes = np.arange(info.num_frames)
+    segments = split_at_keyframes(keyframes, info.num_frames, num_workers)
+
+    # workers can write straight into a caller memmap when its file offset is that of the array
+    direct = isinstance(out, np.memmap) and isinstance(out.base, mmap.mmap)
+    if direct:
+        out.flush()
+        shm, target = None, ("memmap", out.filename, out.offset)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)), 1))
+        target = ("shm", shm.name)
+    try:
+        # spawn, as forked workers would inherit the decoder threads of the parent process
+        with ProcessPoolExecutor(max_workers=len(segments), mp_context=get_context("spawn")) as executor:
+            futures = [executor.submit(_decode_segment, path, target, shape, start, end,
+                                       (width, height), mode, backend)
+                       for start, end in segments]
+            n_decoded = [future.result() for future in futures]
+        frames = out if direct else _shm_array(shm, shape)
+    finally:
+        if shm is not None:
+            shm.unlink()  # the block itself is freed with its last mapping, i.e. frames
+
+    # move segments that decoded fewer frames than probed down, only needed if the count was off
+    pos = 0
+    for (start, _), count in zip(segments, n_decoded):
+        if pos != start:
+            frames[pos:pos + count] = frames[start:start + count]
+        pos += count
+    if out is not None and not direct:
+        out[:pos] = frames[:pos]
+        return out[:pos]
+    return frames[:pos]
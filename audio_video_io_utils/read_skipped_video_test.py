@@ -5,11 +5,21 @@ import numpy as np
 from vidgear.gears import CamGear
 
 import os
+import tempfile
+import subprocess
 # uncomment below increase DECORD read retry attempts
 # os.environ['DECORD_EOF_RETRY_MAX'] = "20480"
 from decord import cpu
 from decord import VideoReader, VideoLoader
 
+from video_reader import FrameArray, VideoReader as SparseVideoReader, keyframe_indices, plan_sparse_reads
+
+
+def _sample_capacity(nframes, step, MAX_N_FRAME):
+    """ number of frames kept by the i % step == 0 or i == 1 sample plan
+    """
+    return int(min(MAX_N_FRAME, nframes // max(step, 1) + 1))
+
 
 def get_frame(cap, index):
     if cap.isOpened():
@@ -24,13 +34,14 @@ def get_frame(cap, index):
     return None
 
 
-def get_img_list_opencv_seek(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299)):
+def get_img_list_opencv_seek(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), out=None):
     start = time.time()
     cap = cv2.VideoCapture(video_filename)
     step = fps = int(round(cap.get(cv2.CAP_PROP_FPS)))
     nframes = np.floor(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     print(f"OpenCV Seek: FPS={fps}, num frames={nframes}")
-    img_list = []
+    img_list = FrameArray(_sample_capacity(nframes, step, MAX_N_FRAME),
+                          (reshape_size[1], reshape_size[0], 3), np.float32, out=out)
     i = 0
     save_frames_num = 0
     while cap.isOpened():
@@ -43,22 +54,23 @@ def get_img_list_opencv_seek(video_filename, MAX_N_FRAME=300, reshape_size=(299,
             save_frames_num += 1
             if save_frames_num > MAX_N_FRAME:
                 break
-            img = cv2.resize(img, reshape_size).astype(np.float32)
-            img_list.append(img)
+            # the uint8 resize is cast into the preallocated float32 slot
+            img_list.next_slot()[...] = cv2.resize(img, reshape_size)
     cap.release()
     cv2.destroyAllWindows()
     del cap
     elapsed_time = time.time() - start
-    return np.array(img_list), elapsed_time
+    return img_list.array, elapsed_time
 
 
-def get_img_list_opencv_seq(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299)):
+def get_img_list_opencv_seq(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), out=None):
     start = time.time()
     cap = cv2.VideoCapture(video_filename)
     step = fps = int(round(cap.get(cv2.CAP_PROP_FPS)))
     nframes = np.floor(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     print(f"OpenCV Seq: FPS={fps}, num frames={nframes}")
-    img_list = []
+    img_list = FrameArray(_sample_capacity(nframes, step, MAX_N_FRAME),
+                          (reshape_size[1], reshape_size[0], 3), np.float32, out=out)
     i = 0
     save_frames_num = 0
     ret, frame = cap.read()
@@ -69,24 +81,62 @@ def get_img_list_opencv_seq(video_filename, MAX_N_FRAME=300, reshape_size=(299,
             save_frames_num += 1
             if save_frames_num > MAX_N_FRAME:
                 break
-            img = cv2.resize(img, reshape_size).astype(np.float32)
-            img_list.append(img)
+            img_list.next_slot()[...] = cv2.resize(img, reshape_size)
         ret, frame = cap.read()
     cap.release()
     cv2.destroyAllWindows()
     del cap
     elapsed_time = time.time() - start
-    return np.array(img_list), elapsed_time
+    return img_list.array, elapsed_time
 
 
-def get_img_list_reader_av(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299)):
+def get_img_list_opencv_grab(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), out=None):
+    """Same sample plan as get_img_list_opencv_seq, but skipped frames are only grabbed (decoded)
+    and only kept frames are retrieved, skipping their color conversion and buffer copy
+    """
+    start = time.time()
+    cap = cv2.VideoCapture(video_filename)
+    step = fps = int(round(cap.get(cv2.CAP_PROP_FPS)))
+    nframes = np.floor(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    print(f"OpenCV Grab: FPS={fps}, num frames={nframes}")
+    img_list = FrameArray(_sample_capacity(nframes, step, MAX_N_FRAME),
+                          (reshape_size[1], reshape_size[0], 3), np.float32, out=out)
+    resized = np.empty((reshape_size[1], reshape_size[0], 3), dtype=np.uint8)
+    i = 0
+    save_frames_num = 0
+    while cap.grab():
+        i += 1
+        if i % step == 0 or i == 1:
+            save_frames_num += 1
+            if save_frames_num > MAX_N_FRAME:
+                break
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            # resize before the color conversion, which then runs on the smaller frame
+            cv2.resize(frame, reshape_size, dst=resized)
+            cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=resized)
+            img_list.next_slot()[...] = resized
+    cap.release()
+    del cap
+    elapsed_time = time.time() - start
+    return img_list.array, elapsed_time
+
+
+def get_img_list_reader_av(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), lowres=0, out=None):
+    """lowres: decode at 1 / 2 ** lowres resolution without hardware acceleration,
+    supported by MPEG-4 part 2, H.263 and MJPEG decoders and ignored by H.264/HEVC
+    """
     start = time.time()
     cap = av.open(video_filename)
     cap.streams.video[0].thread_type = 'AUTO'
+    if lowres:
+        cap.streams.video[0].codec_context.options = {"lowres": str(lowres)}
     step = fps = int(round(cap.streams.video[0].average_rate))
     nframes = np.floor(cap.streams.video[0].frames)
     print(f"PyAV Seq: FPS={fps}, num frames={nframes}")
-    img_list = []
+    img_list = FrameArray(_sample_capacity(nframes, step, MAX_N_FRAME),
+                          (reshape_size[1], reshape_size[0], 3), np.float32, out=out)
     i = 0
     save_frames_num = 0
     for frame in cap.decode(video=0):
@@ -96,21 +146,21 @@ def get_img_list_reader_av(video_filename, MAX_N_FRAME=300, reshape_size=(299, 2
             save_frames_num += 1
             if save_frames_num > MAX_N_FRAME:
                 break
-            img = cv2.resize(img, reshape_size).astype(np.float32)
-            img_list.append(img)
+            img_list.next_slot()[...] = cv2.resize(img, reshape_size)
     cap.close()
     del cap
     elapsed_time = time.time() - start
-    return np.array(img_list), elapsed_time
+    return img_list.array, elapsed_time
 
 
-def get_img_list_vidgear_seq(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299)):
+def get_img_list_vidgear_seq(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), out=None):
     start = time.time()
     stream = CamGear(source=video_filename).start()
     step = fps = int(stream.stream.get(cv2.CAP_PROP_FPS))
     nframes = np.floor(stream.stream.get(cv2.CAP_PROP_FRAME_COUNT))
     print(f"VidGears Seq: FPS={fps}, num frames={nframes}")
-    img_list = []
+    img_list = FrameArray(_sample_capacity(nframes, step, MAX_N_FRAME),
+                          (reshape_size[1], reshape_size[0], 3), np.float32, out=out)
     i = 0
     save_frames_num = 0
     while i < nframes:
@@ -122,14 +172,13 @@ def get_img_list_vidgear_seq(video_filename, MAX_N_FRAME=300, reshape_size=(299,
             save_frames_num += 1
             if save_frames_num > MAX_N_FRAME:
                 break
-            img = cv2.resize(frame, reshape_size).astype(np.float32)
-            img_list.append(img)
+            img_list.next_slot()[...] = cv2.resize(frame, reshape_size)
     stream.stop()
     elapsed_time = time.time() - start
-    return np.array(img_list), elapsed_time
+    return img_list.array, elapsed_time
 
 
-def get_img_list_decord_batched(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299)):
+def get_img_list_decord_batched(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), out=None):
     """Useful for skipping frames
     interval : int
         Intra-batch frame interval.
@@ -157,17 +206,16 @@ def get_img_list_decord_batched(video_filename, MAX_N_FRAME=300, reshape_size=(2
     print(
         f"Decord Batched: FPS={fps}, num frames={len(vl)} * {batch} = {len(vl) * batch}")
 
-    arr = []
-    for batch in vl:
-        arr.append(batch[0].asnumpy())
-    arr = np.array(arr)
-    arr = arr.reshape(-1, height, width, 3)
+    arr = FrameArray(len(vl) * batch, (height, width, 3), out=out)
+    for frames in vl:
+        for frame in frames[0].asnumpy():
+            arr.append(frame)
 
     elapsed_time = time.time() - start
-    return arr, elapsed_time
+    return arr.array, elapsed_time
 
 
-def get_img_list_decord_index(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299)):
+def get_img_list_decord_index(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), out=None):
     """Useful for loading entire video in memory & skipping frames
     CPU will overload if frame length exceeds 2000 frames
     """
@@ -180,19 +228,22 @@ def get_img_list_decord_index(video_filename, MAX_N_FRAME=300, reshape_size=(299
     index_list = [i for i in range(vid_len) if i % step == 0][:MAX_N_FRAME]
     # To get multiple frames at once, use get_batch
     # duplicate frame indices will be accepted and handled internally to avoid duplicate decoding
-    arr = vr.get_batch(index_list).asnumpy()
+    arr = FrameArray(len(index_list), (height, width, 3), out=out)
+    for i in range(0, len(index_list), 64):  # batches of 64 frames bound decord's own buffer
+        arr.extend(vr.get_batch(index_list[i:i + 64]).asnumpy())
 
     elapsed_time = time.time() - start
-    return arr, elapsed_time
+    return arr.array, elapsed_time
 
 
-def get_img_list_decord_seq(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299)):
+def get_img_list_decord_seq(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), out=None):
     t1 = time.time()
     width, height = reshape_size
     vr = VideoReader(video_filename, ctx=cpu(0), width=width, height=height)
     step = fps = int(vr.get_avg_fps())
     print(f"Decord Seq: FPS={fps}, num frames={len(vr)}")
-    arr = []
+    # this loop keeps up to MAX_N_FRAME + 1 frames
+    arr = FrameArray(_sample_capacity(len(vr), step, MAX_N_FRAME + 1), (height, width, 3), out=out)
     save_frames_num = 0
     # # 1. the simplest way is to directly access frames
     for i in range(len(vr)):
@@ -205,11 +256,49 @@ def get_img_list_decord_seq(video_filename, MAX_N_FRAME=300, reshape_size=(299,
             save_frames_num += 1
 
     elapsed_time = time.time() - t1
-    return np.array(arr), elapsed_time
+    return arr.array, elapsed_time
+
+
+def get_img_list_keyframe_aware(video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), backend="pyav", out=None):
+    """Samples 1 frame per second, seeking to keyframes only when that skips decoding
+    frames in between are decoded but not converted
+    """
+    start = time.time()
+    with SparseVideoReader(video_filename, size=reshape_size, backend=backend) as vr:
+        print(f"Keyframe aware {backend}: FPS={vr.fps}, num frames={len(vr)}, "
+              f"keyframes={len(vr.reader.keyframes)}")
+        frames = vr.sample(fps=1.0, max_frames=MAX_N_FRAME)
+    # float32 like the other samplers, the uint8 frames are cast into the preallocated array
+    arr = FrameArray(len(frames), frames.shape[1:], np.float32, out=out)
+    arr.extend(frames)
+    elapsed_time = time.time() - start
+    return arr.array, elapsed_time
+
+
+def check_raw_h264(video_filename, backends=("pyav", "opencv")):
+    """Raw h264 streams have no timestamps, so no keyframes are listed,
+    keyframe-aware sampling must still return the frames of a sequential read
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_filename = os.path.join(tmp_dir, "raw.h264")
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-i", video_filename, "-t", "10", "-an",
+                        "-c:v", "libx264", "-f", "h264", raw_filename], check=True)
+        keyframes = keyframe_indices(raw_filename)
+        assert list(keyframes) == [0], f"raw h264 keyframes {keyframes}"
+        assert plan_sparse_reads([3, 40, 100], []) == [False, False, False]
+        for backend in backends:
+            with SparseVideoReader(raw_filename, size=(64, 48), backend=backend) as vr:
+                frames = np.stack(list(vr))
+                indices = np.arange(0, len(frames), vr.fps).round().astype(np.int64)
+                assert (vr.sample(fps=1.0) == frames[indices]).all(), f"{backend} sample differs"
+                assert (vr.get_batch([7, 2, 2]) == frames[[7, 2, 2]]).all(), f"{backend} get_batch differs"
+                assert (vr[len(frames) - 1] == frames[-1]).all(), f"{backend} last frame differs"
+    print("Raw h264: keyframe-aware reads match sequential reads")
 
 
 def main():
     video_filename = "messi.mp4"
+    check_raw_h264(video_filename)
 
     img_arr, etime = get_img_list_vidgear_seq(
         video_filename, MAX_N_FRAME=300, reshape_size=(299, 299))
@@ -223,10 +312,26 @@ def main():
         video_filename, MAX_N_FRAME=300, reshape_size=(299, 299))
     print("\tOpenCV sequential:", img_arr.shape, etime)
 
+    img_arr, etime = get_img_list_opencv_grab(
+        video_filename, MAX_N_FRAME=300, reshape_size=(299, 299))
+    print("\tOpenCV grab/retrieve:", img_arr.shape, etime)
+
     img_arr, etime = get_img_list_reader_av(
         video_filename, MAX_N_FRAME=300, reshape_size=(299, 299))
     print("\tPyAV Seq:", img_arr.shape, etime)
 
+    img_arr, etime = get_img_list_reader_av(
+        video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), lowres=1)
+    print("\tPyAV Seq lowres=1:", img_arr.shape, etime)
+
+    img_arr, etime = get_img_list_keyframe_aware(
+        video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), backend="pyav")
+    print("\tPyAV keyframe aware:", img_arr.shape, etime)
+
+    img_arr, etime = get_img_list_keyframe_aware(
+        video_filename, MAX_N_FRAME=300, reshape_size=(299, 299), backend="opencv")
+    print("\tOpenCV keyframe aware:", img_arr.shape, etime)
+
     img_arr, etime = get_img_list_decord_seq(
         video_filename, MAX_N_FRAME=300, reshape_size=(299, 299))
     print("\tDecord Seq:", img_arr.shape, etime)
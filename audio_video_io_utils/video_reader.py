@@ -0,0 +1,744 @@
+"""
+Video frame reading with swappable decoding backends (decord, PyAV, OpenCV, ffmpeg)
+
+VideoReader supports iterating over frames, indexing, batch gets of arbitrary frame indices
+and seeking by time. Frames are (H, W, 3) uint8 arrays in RGB (or BGR) order, optionally resized
+to size=(width, height) by the backend's own scaler.
+Frame indices assume a constant frame rate, i.e. frame i is shown at i / fps seconds.
+
+Backends are optional dependencies, only the installed ones are used.
+Without an explicit backend, the backend picked by calibrate_backend for the file extension is used,
+otherwise the first available backend in BACKEND_PRIORITY.
+
+Sample Usage:
+    from video_reader import VideoReader, calibrate_backend
+
+    with VideoReader("video.mp4", size=(800, 600)) as vr:
+        print(len(vr), vr.fps)
+        for frame in vr:                   # sequential decoding
+            ...
+        frame = vr[100]                    # single frame
+        frames = vr.get_batch([0, 30, 60])  # (3, 600, 800, 3)
+        vr.get_batch(range(len(vr)), out=np.lib.format.open_memmap(
+            "frames.npy", mode="w+", dtype=np.uint8, shape=(len(vr), 600, 800, 3)))
+        frame = vr.get_at_time(12.5)       # frame shown at 12.5s
+        frames = vr.sample(fps=1.0)        # 1 frame per second, keyframe-aware seeks
+    calibrate_backend("video.mp4", size=(800, 600))  # pick the fastest backend
+"""
+import re
+import time
+import itertools
+import warnings
+import subprocess
+import os.path as osp
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+try:
+    import av
+except ImportError:
+    av = None
+try:
+    import decord
+except ImportError:
+    decord = None
+try:
+    import ffmpeg
+except ImportError:
+    ffmpeg = None
+
+
+MODES = {"RGB", "BGR"}
+# default order when calibrate_backend has not been run
+BACKEND_PRIORITY = ["decord", "pyav", "opencv", "ffmpeg"]
+# extension -> backend name set by calibrate_backend
+_CALIBRATED = {}
+
+
+class VideoInfo(NamedTuple):
+    width: int
+    height: int
+    fps: float
+    num_frames: int
+
+    @property
+    def duration(self) -> float:
+        return self.num_frames / self.fps
+
+
+def probe_video(path: str) -> VideoInfo:
+    """
+    width, height, average fps and frame count of the first video stream
+    """
+    if av is not None:
+        with av.open(path) as container:
+            stream = container.streams.video[0]
+            fps = float(stream.average_rate or stream.guessed_rate)
+            num_frames = stream.frames
+            if not num_frames:  # not stored in the container, estimate from the duration
+                if stream.duration:
+                    num_frames = int(round(float(stream.duration * stream.time_base) * fps))
+                elif container.duration is not None:
+                    num_frames = int(round(container.duration / av.time_base * fps))
+                else:  # no duration either, e.g. raw h264 streams, count the packets without decoding
+                    num_frames = sum(1 for packet in container.demux(stream) if packet.size)
+            return VideoInfo(stream.codec_context.width, stream.codec_context.height, fps, num_frames)
+    if cv2 is not None:
+        cap = cv2.VideoCapture(path)
+        try:
+            if not cap.isOpened():
+                raise IOError(f"OpenCV could not open {path}")
+            return VideoInfo(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                             int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                             cap.get(cv2.CAP_PROP_FPS),
+                             int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        finally:
+            cap.release()
+    raise ImportError("Probing videos requires av or opencv-python")
+
+
+def keyframe_indices(path: str, info: Optional[VideoInfo] = None) -> np.ndarray:
+    """
+    sorted frame indices of the keyframes of the first video stream
+    packets are only demuxed (PyAV) or listed (ffprobe), nothing is decoded
+    """
+    info = info or probe_video(path)
+    if av is not None:
+        with av.open(path) as container:
+            stream = container.streams.video[0]
+            start_time = stream.start_time or 0
+            pts = [packet.pts for packet in container.demux(stream)
+                   if packet.is_keyframe and packet.pts is not None]
+            seconds = (np.array(pts, dtype=np.float64) - start_time) * float(stream.time_base)
+    elif ffmpeg is not None:
+        probe = ffmpeg.probe(path, select_streams="v:0", show_packets=None,
+                             show_entries="packet=pts_time,flags:stream=start_time")
+        start_time = float(probe["streams"][0].get("start_time", 0))
+        seconds = np.array([float(packet["pts_time"]) for packet in probe["packets"]
+                            if "K" in packet.get("flags", "") and "pts_time" in packet]) - start_time
+    else:
+        raise ImportError("Listing keyframes requires av or ffmpeg-python with ffprobe")
+    if not len(seconds):  # no timestamps, e.g. raw h264 streams, decoding can only start at the first frame
+        return np.zeros(1, dtype=np.int64)
+    return np.unique(np.round(seconds * info.fps).astype(np.int64))
+
+
+def plan_sparse_reads(targets, keyframes=None, pos: int = 0, seek_cost: int = 8) -> List[bool]:
+    """
+    for each sorted unique target frame, whether to seek before reading it instead of
+    decoding sequentially from the current position pos (the next frame the decoder returns)
+    a seek decodes from the keyframe at or before the target, so it only pays off when that keyframe
+    is more than seek_cost frames (the demuxer reset and decoder flush overhead) past pos
+        keyframes: output of keyframe_indices, without it (None or empty) targets are only read sequentially
+    """
+    keyframes = np.asarray(keyframes if keyframes is not None and len(keyframes) else [0], dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    key_pos = np.searchsorted(keyframes, targets, side="right") - 1
+    prev_keys = np.where(key_pos >= 0, keyframes[np.maximum(key_pos, 0)], 0)
+    seeks = []
+    for target, prev_key in zip(targets, prev_keys):
+        seeks.append(bool(target < pos or prev_key - pos > seek_cost))
+        pos = target + 1
+    return seeks
+
+
+class FrameArray:
+    def __init__(self,
+                 capacity: int,
+                 frame_shape: Tuple[int, ...],
+                 dtype=np.uint8,
+                 out: Optional[np.ndarray] = None,
+                 grow_by: float = 1.5):
+        """Frames written in place into a preallocated (capacity, *frame_shape) array
+        size capacity from the probed frame count or the sample plan, the array grows by grow_by
+        if more frames arrive, which copies the frames so far once per growth
+            out: optional caller-supplied array or np.lib.format.open_memmap, never grown
+        """
+        if out is not None and (out.shape[1:] != tuple(frame_shape) or out.dtype != np.dtype(dtype)):
+            raise ValueError(f"out must have frames of shape {tuple(frame_shape)} and dtype {np.dtype(dtype)}")
+        self.data = out if out is not None else np.empty((max(capacity, 1), *frame_shape), dtype=dtype)
+        self.growable = out is None
+        self.grow_by = grow_by
+        self.n_frames = 0
+
+    def _reserve(self, n_frames: int) -> None:
+        """
+        make room for n_frames in total, growing by at least grow_by
+        """
+        if n_frames <= len(self.data):
+            return
+        if not self.growable:
+            raise ValueError(f"out can not hold more than {len(self.data)} frames")
+        capacity = max(n_frames, int(len(self.data) * self.grow_by) + 1)
+        data = np.empty((capacity, *self.data.shape[1:]), dtype=self.data.dtype)
+        data[:self.n_frames] = self.data[:self.n_frames]
+        self.data = data
+
+    def next_slot(self) -> np.ndarray:
+        """
+        view of the next frame to write into, e.g. with cv2.resize(frame, size, dst=slot)
+        """
+        self._reserve(self.n_frames + 1)
+        self.n_frames += 1
+        return self.data[self.n_frames - 1]
+
+    def append(self, frame: np.ndarray) -> None:
+        self.next_slot()[...] = frame
+
+    def extend(self, frames: np.ndarray) -> None:
+        """
+        copy a (N, *frame_shape) batch, e.g. from a decord get_batch, into the next N slots
+        """
+        self._reserve(self.n_frames + len(frames))
+        self.data[self.n_frames:self.n_frames + len(frames)] = frames
+        self.n_frames += len(frames)
+
+    def __len__(self) -> int:
+        return self.n_frames
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        the frames written so far, a view without copying
+        """
+        return self.data[:self.n_frames]
+
+
+def _batch_out(n_frames: int, size: Tuple[int, int], out: Optional[np.ndarray]) -> np.ndarray:
+    width, height = size
+    if out is None:
+        return np.empty((n_frames, height, width, 3), dtype=np.uint8)
+    if out.shape != (n_frames, height, width, 3):
+        raise ValueError(f"out must have shape {(n_frames, height, width, 3)}")
+    return out
+
+
+def _unique_positions(indices: np.ndarray) -> Tuple[np.ndarray, list]:
+    """
+    sorted unique indices and for each the positions in indices that take its frame,
+    sorted unique indices map to themselves without building index arrays
+    """
+    if len(indices) < 2 or (np.diff(indices) > 0).all():
+        return indices, range(len(indices))
+    unique, inverse, counts = np.unique(indices, return_inverse=True, return_counts=True)
+    order = np.argsort(inverse, kind="stable")
+    return unique, np.split(order, np.cumsum(counts)[:-1])
+
+
+class _BackendReader(ABC):
+    """Base class of the backends, subclasses implement iter_frames and optionally get, get_batch
+    """
+
+    def __init__(self, path: str, info: VideoInfo, size=None, mode: str = "RGB"):
+        self.path = path
+        self.info = info
+        self.size = tuple(size) if size is not None else (info.width, info.height)
+        self.mode = mode
+        self._keyframes = None
+
+    @property
+    def keyframes(self) -> Optional[np.ndarray]:
+        """
+        keyframe indices listed on first use, None if they can not be listed
+        """
+        if self._keyframes is None:
+            try:
+                self._keyframes = keyframe_indices(self.path, self.info)
+            except Exception as excep:
+                warnings.warn(f"Could not list the keyframes of {self.path}, reading sequentially: {excep}")
+                self._keyframes = np.zeros(1, dtype=np.int64)
+        return self._keyframes
+
+    def _prev_keyframe(self, index: int) -> int:
+        """
+        the keyframe at or before index, frame 0 needs no keyframe listing
+        """
+        if index == 0:
+            return 0
+        prev_keys = self.keyframes[self.keyframes <= index]
+        return int(prev_keys[-1]) if len(prev_keys) else 0
+
+    @abstractmethod
+    def iter_frames(self, start: int = 0) -> Iterator[np.ndarray]:
+        """
+        yields the frames from index start onwards, only one iteration can be active at a time
+        """
+
+    def get(self, index: int) -> np.ndarray:
+        frames = self.iter_frames(index)
+        try:
+            return next(frames)
+        except StopIteration:
+            raise IndexError(f"Frame {index} could not be decoded from {self.path}") from None
+        finally:
+            frames.close()
+
+    def get_batch(self, indices, out=None) -> np.ndarray:
+        """
+        decode the sorted unique indices in one sequential pass starting at the smallest index
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        out = _batch_out(len(indices), self.size, out)
+        if not len(indices):
+            return out
+        unique, positions = _unique_positions(indices)
+        frames = self.iter_frames(int(unique[0]))
+        pos = unique[0]
+        try:
+            frame = next(frames)
+            for i, index in enumerate(unique):
+                while pos < index:
+                    frame = next(frames)
+                    pos += 1
+                out[positions[i]] = frame
+        except StopIteration:
+            raise IndexError(f"Frame {pos} could not be decoded from {self.path}") from None
+        finally:
+            frames.close()
+        return out
+
+    def close(self):
+        pass
+
+
+class DecordReader(_BackendReader):
+    def __init__(self, path, info, size=None, mode="RGB"):
+        super().__init__(path, info, size, mode)
+        width, height = self.size
+        self.vr = decord.VideoReader(path, ctx=decord.cpu(0), width=width, height=height)
+
+    def _convert(self, frames: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(frames[..., ::-1]) if self.mode == "BGR" else frames
+
+    def iter_frames(self, start=0):
+        # seek alone lands on the next keyframe, seek_accurate decodes from the one before up to start
+        self.vr.seek_accurate(start)
+        for _ in range(start, len(self.vr)):
+            yield self._convert(self.vr.next().asnumpy())
+
+    def get(self, index):
+        return self._convert(self.vr[index].asnumpy())
+
+    def get_batch(self, indices, out=None, chunk_size=64):
+        # decord reorders and deduplicates the indices internally, chunks bound its own batch memory
+        indices = list(indices)
+        out = _batch_out(len(indices), self.size, out)
+        for i in range(0, len(indices), chunk_size):
+            out[i:i + chunk_size] = self._convert(self.vr.get_batch(indices[i:i + chunk_size]).asnumpy())
+        return out
+
+    def close(self):
+        del self.vr
+
+
+class PyAVReader(_BackendReader):
+    def __init__(self, path, info, size=None, mode="RGB"):
+        super().__init__(path, info, size, mode)
+        self._open()
+
+    def _open(self):
+        self.container = av.open(self.path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        self.start_time = self.stream.start_time or 0
+        self.fresh = True  # nothing decoded yet, decoding starts at the first frame without a seek
+
+    def _frame_index(self, frame) -> int:
+        return int(round(float((frame.pts - self.start_time) * self.stream.time_base) * self.info.fps))
+
+    def _to_ndarray(self, frame) -> np.ndarray:
+        width, height = self.size
+        return frame.to_ndarray(width=width, height=height, format="rgb24" if self.mode == "RGB" else "bgr24")
+
+    def _seek_pts(self, index: int) -> int:
+        # targets before the first frame, i.e. index < 0, seek to the start of the file
+        return self.start_time + int(np.floor(index / self.info.fps / self.stream.time_base))
+
+    def _decode_from(self, start: int):
+        """
+        yield the decoded (index, av frame) from start on, frames are only converted to arrays by the caller
+        seeks target the keyframe at or before start, some demuxers (e.g. MPEG-TS, seeking by dts)
+        land on the keyframe after the target, the index of the first decoded frame tells and the seek
+        is repeated further back, as with OpenCVReader._seek
+        before the second keyframe the container is decoded from its first frame without a seek,
+        which also reads streams without timestamps (e.g. raw h264), their frames are counted instead
+        """
+        target = self._prev_keyframe(start)
+        if target == 0:
+            if not self.fresh:
+                self.container.close()
+                self._open()
+            frames = self.container.decode(self.stream)
+        else:
+            back = 0
+            while True:
+                self.container.seek(self._seek_pts(target - back), stream=self.stream,
+                                    backward=True, any_frame=False)
+                frames = self.container.decode(self.stream)
+                first = next(frames, None)
+                if first is None:  # landed past the last keyframe
+                    index = start + 1
+                else:
+                    index = self._frame_index(first) if first.pts is not None else start
+                if index <= start or target - back < 0:
+                    break
+                back = 2 * back + 1 + index - start
+            if first is None:
+                return
+            frames = itertools.chain([first], frames)
+        self.fresh = False
+        index = -1
+        for frame in frames:
+            index = self._frame_index(frame) if frame.pts is not None else index + 1
+            if index >= start:
+                yield index, frame
+
+    def iter_frames(self, start=0):
+        for _, frame in self._decode_from(start):
+            yield self._to_ndarray(frame)
+
+    def get_batch(self, indices, out=None):
+        """
+        keyframe-aware sparse reads, frames between targets are decoded but never converted
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        out = _batch_out(len(indices), self.size, out)
+        if not len(indices):
+            return out
+        unique, positions = _unique_positions(indices)
+        frames = None
+        for i, (target, seek) in enumerate(zip(unique, plan_sparse_reads(unique, self.keyframes))):
+            if seek or frames is None:
+                frames = self._decode_from(int(target))
+            for index, frame in frames:
+                if index >= target:
+                    break
+            else:
+                raise IndexError(f"Frame {target} could not be decoded from {self.path}")
+            out[positions[i]] = self._to_ndarray(frame)
+        return out
+
+    def close(self):
+        self.container.close()
+
+
+class OpenCVReader(_BackendReader):
+    def __init__(self, path, info, size=None, mode="RGB"):
+        super().__init__(path, info, size, mode)
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"OpenCV could not open {path}")
+        self.pos = 0
+
+    def _convert(self, frame: np.ndarray) -> np.ndarray:
+        if self.size != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if self.mode == "RGB" else frame
+
+    def _grabbed_index(self) -> int:
+        return int(round(self.cap.get(cv2.CAP_PROP_POS_MSEC) * self.info.fps / 1000))
+
+    def _seek(self, start: int) -> bool:
+        """
+        grab frame start so that the next retrieve returns it, False if the video ends before
+        CAP_PROP_POS_FRAMES is not trusted as it can land a few frames off on some containers,
+        the seek is by time and the timestamps of the grabbed frames give their real index:
+        landing early is fixed by grabbing forward, landing late by seeking again further back
+        """
+        self.pos = -1  # unknown until the seek succeeds
+        if self._prev_keyframe(start) == 0:
+            # decoding from the first frame anyway, reopen instead of seeking,
+            # which also reads streams without timestamps (e.g. raw h264)
+            self.cap.release()
+            self.cap = cv2.VideoCapture(self.path)
+            for _ in range(start + 1):
+                if not self.cap.grab():
+                    return False
+            self.pos = start
+            return True
+        back = 0
+        while True:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, max(start - back - 0.5, 0) * 1000 / self.info.fps)
+            if not self.cap.grab():
+                return False
+            index = self._grabbed_index()
+            if index <= start or start - back <= 0:
+                break
+            back = 2 * back + index - start
+        while index < start:
+            if not self.cap.grab():
+                return False
+            index = self._grabbed_index()
+        self.pos = start
+        return True
+
+    def iter_frames(self, start=0):
+        grabbed = self._seek(start) if self.pos != start else self.cap.grab()
+        while grabbed:
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                return
+            self.pos += 1
+            yield self._convert(frame)
+            grabbed = self.cap.grab()
+
+    def get_batch(self, indices, out=None):
+        """
+        keyframe-aware sparse reads, frames between targets are grabbed without retrieve
+        a seek decodes from the keyframe before the target and grabs up to it
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        out = _batch_out(len(indices), self.size, out)
+        if not len(indices):
+            return out
+        unique, positions = _unique_positions(indices)
+        for i, (target, seek) in enumerate(zip(unique, plan_sparse_reads(unique, self.keyframes, self.pos))):
+            if seek:
+                ret = self._seek(int(target))
+            else:
+                ret = True
+                while ret and self.pos < target:
+                    ret = self.cap.grab()
+                    self.pos += 1
+                ret = ret and self.cap.grab()
+            ret, frame = self.cap.retrieve() if ret else (False, None)
+            if not ret:
+                raise IndexError(f"Frame {target} could not be decoded from {self.path}")
+            self.pos = int(target) + 1
+            out[positions[i]] = self._convert(frame)
+        return out
+
+    def close(self):
+        self.cap.release()
+
+
+def _readinto_exact(fptr, view: memoryview) -> int:
+    """
+    fill view from fptr, returns the number of bytes read which is less than len(view) only at EOF
+    """
+    n_read = 0
+    while n_read < len(view):
+        n = fptr.readinto(view[n_read:])
+        if not n:
+            break
+        n_read += n
+    return n_read
+
+
+@lru_cache(maxsize=None)
+def _passthrough_option() -> dict:
+    """
+    ffmpeg output option keeping one output frame per decoded frame,
+    -fps_mode replaced -vsync in ffmpeg 5.1 and -vsync is deprecated since
+    """
+    try:
+        version = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout
+    except OSError:
+        version = ""
+    match = re.search(r"version n?(\d+)\.(\d+)", version)  # git builds have no version number
+    if match and (int(match[1]), int(match[2])) < (5, 1):
+        return {"vsync": "passthrough"}
+    return {"fps_mode": "passthrough"}
+
+
+def stream_frames_ffmpeg(path: str,
+                         size: Optional[Tuple[int, int]] = None,
+                         start_time: float = 0.0,
+                         mode: str = "RGB",
+                         frames_per_read: int = 1,
+                         info: Optional[VideoInfo] = None) -> Iterator[np.ndarray]:
+    """
+    stream decoded frames from an ffmpeg rawvideo pipe with bounded memory
+    ffmpeg is spawned once and frames are read with readinto into one reusable buffer
+        size: (width, height) of the output frames, defaults to the video size
+        start_time: seconds to start at, ffmpeg seeks to the keyframe before and drops earlier frames
+        frames_per_read: number of frames read per pipe read
+    yields (frames_per_read, H, W, 3) views of the reusable buffer, the last one may hold fewer frames
+    the buffer is overwritten by the next read, copy the frames to keep them
+    the ffmpeg process is terminated when the generator is closed or garbage collected
+    """
+    info = info or probe_video(path)
+    width, height = tuple(size) if size is not None else (info.width, info.height)
+    stream = ffmpeg.input(path, ss=start_time) if start_time > 0 else ffmpeg.input(path)
+    if (width, height) != (info.width, info.height):
+        stream = stream.filter("scale", width, height)
+    process = (stream
+               # passthrough keeps one output frame per decoded frame, by default rawvideo output
+               # duplicates frames to fill a constant frame rate counted from the seek time
+               .output("pipe:", format="rawvideo", pix_fmt="rgb24" if mode == "RGB" else "bgr24",
+                       loglevel="error", **_passthrough_option())
+               .run_async(pipe_stdout=True))
+
+    frame_bytes = width * height * 3
+    buffer = np.empty((frames_per_read, height, width, 3), dtype=np.uint8)
+    view = memoryview(buffer).cast("B")
+    try:
+        while True:
+            n_read = _readinto_exact(process.stdout, view)
+            n_frames = n_read // frame_bytes
+            if n_frames:
+                yield buffer[:n_frames]
+            if n_read < len(view):  # EOF
+                break
+        if process.wait() != 0:
+            raise IOError(f"ffmpeg exited with code {process.returncode} while decoding {path}")
+    finally:
+        if process.poll() is None:
+            # closed before EOF, ffmpeg blocked on a full pipe does not handle SIGTERM
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+class FFmpegReader(_BackendReader):
+    def iter_frames(self, start=0):
+        # before the second keyframe, decode from the first frame and drop frames by count,
+        # which also reads streams without timestamps (e.g. raw h264)
+        skip = start if self._prev_keyframe(start) == 0 else 0
+        # start half a frame early so float rounding can not drop the start frame
+        frames = stream_frames_ffmpeg(self.path, self.size, 0 if skip else max(start - 0.5, 0) / self.info.fps,
+                                      self.mode, info=self.info)
+        try:
+            for frame in frames:
+                if skip:
+                    skip -= 1
+                    continue
+                yield frame[0].copy()
+        finally:
+            frames.close()
+
+
+BACKENDS = {"decord": (DecordReader, decord),
+            "pyav": (PyAVReader, av),
+            "opencv": (OpenCVReader, cv2),
+            "ffmpeg": (FFmpegReader, ffmpeg)}
+
+
+def available_backends() -> list:
+    return [name for name, (_, module) in BACKENDS.items() if module is not None]
+
+
+def _default_backend(path: str) -> str:
+    ext = osp.splitext(path)[-1].lower()
+    if ext in _CALIBRATED:
+        return _CALIBRATED[ext]
+    available = available_backends()
+    for name in BACKEND_PRIORITY:
+        if name in available:
+            return name
+    raise ImportError("No video decoding backend installed, install one of decord, av, opencv-python, ffmpeg-python")
+
+
+class VideoReader:
+    def __init__(self,
+                 path: str,
+                 size: Optional[Tuple[int, int]] = None,
+                 mode: str = "RGB",
+                 backend: Optional[str] = None):
+        """Read frames of a video with one of BACKENDS
+            size: (width, height) of the output frames, defaults to the video size
+            mode: RGB or BGR (for use with cv2 funcs)
+            backend: one of BACKENDS, defaults to the calibrated or first available backend
+        """
+        if mode not in MODES:
+            raise ValueError(f"{mode} mode is not supported, use one of {MODES}")
+        self.path = str(path)
+        self.backend = backend or _default_backend(self.path)
+        reader_cls, module = BACKENDS[self.backend]
+        if module is None:
+            raise ImportError(f"{self.backend} backend is not installed")
+        self.info = probe_video(self.path)
+        self.reader = reader_cls(self.path, self.info, size, mode)
+        if self.backend == "decord":  # decord knows the exact frame count after indexing the video
+            self.info = self.info._replace(num_frames=len(self.reader.vr))
+        self.size = self.reader.size
+
+    @property
+    def fps(self) -> float:
+        return self.info.fps
+
+    def __len__(self) -> int:
+        return self.info.num_frames
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return self.reader.iter_frames(0)
+
+    def iter_frames(self, start: int = 0) -> Iterator[np.ndarray]:
+        return self.reader.iter_frames(self._check_index(start))
+
+    def _check_index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Frame index {index} out of range for {len(self)} frames")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.get_batch(range(*index.indices(len(self))))
+        return self.reader.get(self._check_index(int(index)))
+
+    def get_batch(self, indices, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        (len(indices), H, W, 3) array of the frames at indices, in the given order
+            out: optional preallocated uint8 array or memmap the frames are written into
+        """
+        return self.reader.get_batch([self._check_index(int(i)) for i in indices], out=out)
+
+    def sample(self, fps: float = 1.0, max_frames: Optional[int] = None,
+               out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        frames sampled at fps frames per second, decoding only what the keyframe-aware plan needs
+        """
+        indices = np.unique(np.floor(np.arange(0, self.info.duration, 1 / fps) * self.fps + 1e-6).astype(np.int64))
+        indices = indices[indices < len(self)][:max_frames]
+        return self.get_batch(indices, out=out)
+
+    def index_at(self, seconds: float) -> int:
+        """
+        index of the frame shown at seconds
+        """
+        return min(int(seconds * self.fps + 1e-6), len(self) - 1)
+
+    def get_at_time(self, seconds: float) -> np.ndarray:
+        return self[self.index_at(seconds)]
+
+    def close(self):
+        self.reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def calibrate_backend(sample_path: str, size=None, n_frames: int = 100) -> str:
+    """
+    time sequential decoding of n_frames with all available backends on a representative video
+    and use the fastest as the default for videos with the same extension
+    returns the name of the fastest backend
+    """
+    timings = {}
+    for name in available_backends():
+        try:
+            t1 = time.perf_counter()
+            with VideoReader(sample_path, size, backend=name) as vr:
+                for i, _ in enumerate(vr):
+                    if i + 1 >= n_frames:
+                        break
+            timings[name] = time.perf_counter() - t1
+        except Exception as excep:
+            warnings.warn(f"{name} backend failed on {sample_path}: {excep}")
+    if not timings:
+        raise IOError(f"No backend could read {sample_path}")
+    fastest = min(timings, key=timings.get)
+    _CALIBRATED[osp.splitext(str(sample_path))[-1].lower()] = fastest
+    return fastest
@@ -3,49 +3,109 @@
 #include <stdint.h>
 
 
+size_t count_runs(const uint8_t *image_np_arr, size_t in_size) {
+        /* count the number of runs in image_np_arr
+           i.e. [0,0,0,1,1,1,1] => 2
+
+           compress needs an encoded_arr of size 2 * count_runs(...)
+         */
+
+        size_t i;
+        size_t nruns = in_size > 0 ? 1 : 0;
+
+        for (i = 1; i < in_size; i++) {
+                if (image_np_arr[i] != image_np_arr[i - 1]) {
+                        nruns++;
+                }
+        }
+        return nruns;
+}
+
+
 int compress(const uint8_t *image_np_arr, size_t in_size, int *encoded_arr, size_t out_size) {
         /* compress an int array image_np_arr to show number and count of that number
            i.e. [0,0,0,1,1,1,1] => [0,3,1,4]
 
            returns the ending index in encoded_arr
+           or -1 if out_size is too small to hold all runs
          */
 
         size_t i;
-        int j = 0;
+        size_t j = 0;
         int ccount = 0;
-        uint8_t prev = image_np_arr[0];
-        size_t esize = 1;
+        uint8_t prev;
+
+        if (in_size == 0) return 0;
+        prev = image_np_arr[0];
 
         for (i = 0; i < in_size; i++) {
                 if (image_np_arr[i] == prev) {
                         ccount++;
                 }
                 else {
+                        if (j + 2 > out_size) return -1;
                         encoded_arr[j++] = prev;
-                        if (j > out_size) return -1;
                         encoded_arr[j++] = ccount;
-                        if (j > out_size) return -1;
                         ccount = 1;
                 }
                 prev = image_np_arr[i];
         }
+        if (j + 2 > out_size) return -1;
         encoded_arr[j++] = prev;
-        if (j > out_size) return -1;
         encoded_arr[j++] = ccount;
-        if (j > out_size) return -1;
 
         return j; // return end index in encoded_arr
 }
 
+int64_t count_runs_batch(const uint8_t *masks, size_t n_masks, size_t mask_size, int64_t *offsets) {
+        /* fill offsets (n_masks + 1 elements) with the start index of the runs of each mask
+           in the batched encoded_arr, i.e. the cumulative sum of 2 * count_runs for each mask
+
+           returns the total size of the batched encoded_arr
+         */
+
+        size_t i;
+        offsets[0] = 0;
+        for (i = 0; i < n_masks; i++) {
+                offsets[i + 1] = offsets[i] + 2 * count_runs(masks + i * mask_size, mask_size);
+        }
+        return offsets[n_masks];
+}
+
+
+int64_t compress_batch(const uint8_t *masks, size_t n_masks, size_t mask_size,
+                       int *encoded_arr, size_t out_size, int64_t *offsets) {
+        /* compress n_masks contiguous masks of mask_size each in one call
+           offsets must have n_masks + 1 elements and be filled by count_runs_batch
+           runs of mask i are written to encoded_arr[offsets[i]:offsets[i + 1]]
+
+           returns the ending index in encoded_arr as int64_t, batches can hold more than 2^31 runs,
+           or -1 if out_size or offsets are too small to hold all runs
+         */
+
+        size_t i;
+        int end_idx;
+
+        for (i = 0; i < n_masks; i++) {
+                if ((size_t)offsets[i + 1] > out_size) return -1;
+                end_idx = compress(masks + i * mask_size, mask_size,
+                                   encoded_arr + offsets[i],
+                                   (size_t)(offsets[i + 1] - offsets[i]));
+                if (end_idx == -1) return -1;
+        }
+        return offsets[n_masks];
+}
+
+
 int main() {
         uint8_t a[] = {1,1,1,1,0,0,0,2,2,2,2};
         size_t asz = 11;
-        int b[] = {0,0,0,0,0,0,0};
-        size_t bsz = 7;
-        size_t idx = compress(a, asz, b, bsz);
+        int b[] = {0,0,0,0,0,0};
+        size_t bsz = 2 * count_runs(a, asz);
+        int idx = compress(a, asz, b, bsz);
         for (size_t i = 0; i < 6; i++) {
                 printf("%d\n", b[i]);
         }
-        printf("value of end index is %zu\n", idx);
+        printf("value of end index is %d\n", idx);
         return 0;
 }
@@ -0,0 +1,179 @@
+"""
+Benchmark encode/decode throughput, compression ratio and peak memory of the mask codecs
+over synthetic mask families. Results are printed and saved as JSON for regression tracking
+
+Sample Usage:
+    make
+    python compression_bench.py --sizes 256 1024 2048 --repeat 5 --output bench_results/run.json
+    python compression_bench.py --codecs numpy c --families blobs edges
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import os.path as osp
+from datetime import datetime, timezone
+
+import numpy as np
+
+from rle import encode_rle, decode_rle
+from compression_test import (
+    encode_np_array,
+    decode_np_array,
+    encode_np_array_c,
+    _get_encoding_func,
+)
+
+
+MASK_FAMILIES = ["noise", "blobs", "edges", "many_classes"]
+CODECS = ["python", "numpy", "c"]
+
+
+def make_mask(family: str, size: int, seed: int = 42) -> np.ndarray:
+    """
+    generate a (size, size) uint8 mask of a synthetic family
+        noise:        random 0/1 pixels, worst case for RLE
+        blobs:        a few large filled ellipses on background
+        edges:        thin 1px contour lines on background
+        many_classes: 255 class rectangles tiled over the mask
+    """
+    rng = np.random.default_rng(seed)
+    if family == "noise":
+        return rng.integers(0, 2, (size, size), dtype=np.uint8)
+
+    yy, xx = np.mgrid[:size, :size]
+    mask = np.zeros((size, size), dtype=np.uint8)
+    if family == "blobs":
+        for cls in range(1, 6):
+            cy, cx = rng.integers(0, size, 2)
+            ry, rx = rng.integers(size // 10 + 1, size // 4 + 2, 2)
+            mask[((yy - cy) / ry) ** 2 + ((xx - cx) / rx) ** 2 <= 1] = cls
+    elif family == "edges":
+        for _ in range(20):
+            cy, cx = rng.integers(0, size, 2)
+            r = rng.integers(size // 20 + 1, size // 3 + 2)
+            dist = np.sqrt((yy - cy) ** 2 + (xx - cx) ** 2)
+            mask[np.abs(dist - r) < 0.5] = 1
+    elif family == "many_classes":
+        tiles = 16
+        tile = -(-size // tiles)
+        classes = rng.integers(1, 256, (tiles, tiles), dtype=np.uint8)
+        mask = np.kron(classes, np.ones((tile, tile), dtype=np.uint8))[:size, :size]
+        mask = np.ascontiguousarray(mask)
+    else:
+        raise ValueError(f"{family} mask family is not supported")
+    return mask
+
+
+def get_codec(name: str):
+    """
+    returns (encode_func, decode_func, bytes per encoded element) taking flat uint8 masks
+    """
+    if name == "python":
+        return encode_np_array, decode_np_array, 4
+    if name == "numpy":
+        return encode_rle, decode_rle, 4
+    if name == "c":
+        compress_func = _get_encoding_func()
+        # there is no native decoder, the vectorized decoder is used
+        return (lambda arr: encode_np_array_c(arr, compress_func)), decode_rle, 4
+    raise ValueError(f"{name} codec is not supported")
+
+
+def time_func(func, arg, repeat: int):
+    """
+    returns the output and the per call times in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        out = func(arg)
+        times.append(time.perf_counter() - t1)
+    return out, times
+
+
+def peak_memory(func, arg) -> int:
+    """
+    peak bytes allocated by python & numpy during a single call
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def bench_codec(codec: str, family: str, size: int, repeat: int) -> dict:
+    encode_func, decode_func, elem_bytes = get_codec(codec)
+    mask = make_mask(family, size).reshape(-1)
+    mbytes = mask.nbytes / 1e6
+
+    encoded, enc_times = time_func(encode_func, mask, repeat)
+    decoded, dec_times = time_func(decode_func, encoded, repeat)
+    enc_median, dec_median = float(np.median(enc_times)), float(np.median(dec_times))
+    return {
+        "codec": codec,
+        "family": family,
+        "shape": [size, size],
+        "input_bytes": mask.nbytes,
+        "encoded_bytes": len(encoded) * elem_bytes,
+        "compression_ratio": mask.nbytes / max(len(encoded) * elem_bytes, 1),
+        "encode_ms_median": enc_median * 1000,
+        "decode_ms_median": dec_median * 1000,
+        "encode_mb_s": mbytes / enc_median if enc_median else float("inf"),
+        "decode_mb_s": mbytes / dec_median if dec_median else float("inf"),
+        "encode_peak_mem_mb": peak_memory(encode_func, mask) / 1e6,
+        "decode_peak_mem_mb": peak_memory(decode_func, encoded) / 1e6,
+        "round_trip_ok": bool(np.array_equal(np.asarray(decoded, dtype=np.uint8), mask)),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark mask compression codecs")
+    parser.add_argument("-c", "--codecs", nargs="+", default=CODECS, choices=CODECS,
+                        help="Codecs to benchmark (default: %(default)s)")
+    parser.add_argument("-f", "--families", nargs="+", default=MASK_FAMILIES, choices=MASK_FAMILIES,
+                        help="Synthetic mask families (default: %(default)s)")
+    parser.add_argument("-s", "--sizes", nargs="+", type=int, default=[256, 1024],
+                        help="Side lengths of the square masks (default: %(default)s)")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Timed calls per measurement, the median is reported (default: %(default)s)")
+    parser.add_argument("-o", "--output", default=osp.join("bench_results", "compression_bench.json"),
+                        help="Path to the JSON results (default: %(default)s)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = []
+    for size in args.sizes:
+        for family in args.families:
+            for codec in args.codecs:
+                res = bench_codec(codec, family, size, args.repeat)
+                results.append(res)
+                print(f"{codec:>7} {family:>13} {size:>5}x{size:<5} "
+                      f"enc {res['encode_mb_s']:9.1f} MB/s  dec {res['decode_mb_s']:9.1f} MB/s  "
+                      f"ratio {res['compression_ratio']:8.2f}  "
+                      f"peak enc {res['encode_peak_mem_mb']:8.2f} MB  "
+                      f"{'ok' if res['round_trip_ok'] else 'ROUND TRIP FAILED'}")
+
+    meta = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "repeat": args.repeat,
+    }
+    os.makedirs(osp.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as fptr:
+        json.dump({"meta": meta, "results": results}, fptr, indent=4)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
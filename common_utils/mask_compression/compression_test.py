@@ -1,9 +1,18 @@
 #  compresses segmentation masks
 
+import os
+import sys
 import ctypes
 import timeit
+import os.path as osp
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from numpy.ctypeslib import ndpointer
+
+from rle import encode_rle, decode_rle
+
+LIB_DIR = osp.dirname(osp.abspath(__file__))
+sys.path.append(osp.dirname(LIB_DIR))
+from native_kernels import array_arg, get_kernel  # noqa: E402
 
 
 def encode_np_array(arr):
@@ -34,49 +43,146 @@ def decode_np_array(arr):
     return decoded_arr
 
 
-def _get_encoding_func(shared_lib_path="./libcompress.so"):
+def _get_encoding_func():
     """ input array must be contiguous, i.e. send a flattened array
     """
-    lib = ctypes.cdll.LoadLibrary(shared_lib_path)
-    compress_func = lib.compress
-    compress_func.restype = ctypes.c_int32
-    compress_func.argtypes = [ndpointer(ctypes.c_uint8, flags="C_CONTIGUOUS"),
-                              ctypes.c_size_t,
-                              ndpointer(ctypes.c_int, flags="C_CONTIGUOUS"),
-                              ctypes.c_size_t]
-    return compress_func
+    return get_kernel("compress", "compress",
+                      argtypes=[array_arg(np.uint8), ctypes.c_size_t,
+                                array_arg(np.int32, writeable=True), ctypes.c_size_t],
+                      restype=ctypes.c_int32,
+                      search_dirs=[LIB_DIR])
+
+
+def _get_count_runs_func():
+    """ returns the number of runs in a contiguous array,
+    the encoded output of compress needs 2 * num runs elements
+    """
+    return get_kernel("compress", "count_runs",
+                      argtypes=[array_arg(np.uint8), ctypes.c_size_t],
+                      restype=ctypes.c_size_t,
+                      search_dirs=[LIB_DIR])
 
 
-def encode_np_array_c(indata, compress_func, outdata_size=None):
+def _get_batch_encoding_funcs():
+    """ returns the count_runs_batch and compress_batch funcs
+    input masks must be a contiguous (N, H, W) stack
+    """
+    count_runs_batch_func = get_kernel(
+        "compress", "count_runs_batch",
+        argtypes=[array_arg(np.uint8), ctypes.c_size_t, ctypes.c_size_t,
+                  array_arg(np.int64, ndim=1, writeable=True)],
+        restype=ctypes.c_int64,
+        search_dirs=[LIB_DIR])
+    compress_batch_func = get_kernel(
+        "compress", "compress_batch",
+        argtypes=[array_arg(np.uint8), ctypes.c_size_t, ctypes.c_size_t,
+                  array_arg(np.int32, writeable=True), ctypes.c_size_t,
+                  array_arg(np.int64, ndim=1)],
+        restype=ctypes.c_int64,
+        search_dirs=[LIB_DIR])
+    return count_runs_batch_func, compress_batch_func
+
+
+def encode_np_array_c(indata, compress_func, outdata_size=None, count_runs_func=None):
     """args: indata: a contiguous list/numpy.ndarray that needs to be compressed
              compress_func: compression function to use
-             outdata_size: size of outdata buffer
+             outdata_size: size of outdata buffer. If None, the exact size is counted with count_runs_func
+             count_runs_func: run counting function to use
     """
     if outdata_size is None:
-        outdata_size = len(indata) if len(
-            indata) < 100000 else int(len(indata) // 1.5)
+        if count_runs_func is None:
+            count_runs_func = _get_count_runs_func()
+        outdata_size = 2 * count_runs_func(indata, len(indata))
 
-    outdata = np.full(outdata_size, -1, dtype=np.int32)
+    outdata = np.empty(outdata_size, dtype=np.int32)
     end_idx = compress_func(indata, len(indata), outdata, len(outdata))
 
     if end_idx == -1:
         # outdata_buffer size / outdata_size was not enough,
-        # so use the max possible size of outdata_buffer
-        print("outdata_size is too small. Retrying with max possible size")
-        return encode_np_array_c(indata, compress_func, len(indata) * 2)
+        # so count the exact size of outdata_buffer
+        print("outdata_size is too small. Retrying with exact size")
+        return encode_np_array_c(indata, compress_func, None, count_runs_func)
 
     outdata = outdata[:end_idx]
     return outdata
 
 
+def encode_np_batch_c(masks):
+    """args: masks: a (N, H, W) or (N, L) uint8 numpy.ndarray stack of masks
+    returns the encoded runs of all masks and an offsets arr of N + 1 elements
+    where the runs of mask i are encoded[offsets[i]:offsets[i + 1]]
+    """
+    masks = np.ascontiguousarray(masks, dtype=np.uint8)
+    n_masks = len(masks)
+    mask_size = masks[0].size if n_masks else 0
+    count_runs_batch_func, compress_batch_func = _get_batch_encoding_funcs()
+
+    offsets = np.empty(n_masks + 1, dtype=np.int64)
+    out_size = count_runs_batch_func(masks, n_masks, mask_size, offsets)
+    encoded = np.empty(out_size, dtype=np.int32)
+    end_idx = compress_batch_func(masks, n_masks, mask_size, encoded, out_size, offsets)
+    if end_idx == -1:
+        raise RuntimeError("compress_batch output buffer was too small")
+    return encoded, offsets
+
+
+def encode_np_batch_c_mthread(masks, num_workers=None, chunk_size=None):
+    """args: masks: a (N, H, W) or (N, L) uint8 numpy.ndarray stack of masks
+             num_workers: number of threads, defaults to the cpu count
+             chunk_size: number of masks encoded per native call, defaults to N / (4 * num_workers)
+    ctypes releases the GIL during native calls, so chunks are encoded in parallel.
+    Output is identical to encode_np_batch_c regardless of num_workers
+    """
+    masks = np.ascontiguousarray(masks, dtype=np.uint8)
+    n_masks = len(masks)
+    mask_size = masks[0].size if n_masks else 0
+    num_workers = num_workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-n_masks // (4 * num_workers)))
+    count_runs_batch_func, compress_batch_func = _get_batch_encoding_funcs()
+    chunks = [masks[i:i + chunk_size] for i in range(0, n_masks, chunk_size)]
+
+    def _count_chunk(chunk):
+        chunk_offsets = np.empty(len(chunk) + 1, dtype=np.int64)
+        count_runs_batch_func(chunk, len(chunk), mask_size, chunk_offsets)
+        return chunk_offsets
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        # 1st pass, count runs of each chunk to get the exact output size and chunk positions
+        chunk_offsets_list = list(executor.map(_count_chunk, chunks))
+        chunk_bases = np.cumsum([0] + [co[-1] for co in chunk_offsets_list])
+        encoded = np.empty(chunk_bases[-1], dtype=np.int32)
+
+        # 2nd pass, each chunk writes into its own slice of the shared output buffer
+        def _compress_chunk(i):
+            chunk_out = encoded[chunk_bases[i]:chunk_bases[i + 1]]
+            return compress_batch_func(chunks[i], len(chunks[i]), mask_size,
+                                       chunk_out, len(chunk_out), chunk_offsets_list[i])
+
+        if -1 in executor.map(_compress_chunk, range(len(chunks))):
+            raise RuntimeError("compress_batch output buffer was too small")
+
+    offsets = np.empty(n_masks + 1, dtype=np.int64)
+    offsets[-1] = chunk_bases[-1]
+    for i, chunk_offsets in enumerate(chunk_offsets_list):
+        offsets[i * chunk_size:i * chunk_size + len(chunks[i])] = chunk_offsets[:-1] + chunk_bases[i]
+    return encoded, offsets
+
+
+def split_batch_encoding(encoded, offsets):
+    """ split the output of encode_np_batch_c into a list of per mask runs (views, no copies)
+    """
+    return [encoded[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
 def main():
     indata = np.load('sample_img_mask.npy').astype(np.uint8)
-    print("Input data sent to both funcs", indata, indata.size)
+    print("Input data sent to all funcs", indata, indata.size)
 
     outdata_c = encode_np_array_c(indata, _get_encoding_func())
-    time_taken = timeit.timeit("indata = np.load('image.npy').astype(np.uint8); encode_np_array_c(indata, _get_encoding_func())",
-                               number=10, globals=globals()) / 10
-    print(f"c and python {time_taken:.4f}s or {time_taken*1000:.2f}ms")
+    time_taken = timeit.timeit("encode_np_array_c(indata, _get_encoding_func())",
+                               number=10, globals={**globals(), "indata": indata}) / 10
+    print(f"c {time_taken:.4f}s or {time_taken*1000:.2f}ms")
     print("Output from c func", outdata_c, len(outdata_c))
 
     # check if encoded arr matches the orig image
@@ -85,16 +191,29 @@ def main():
           if dec == indata.tolist() else "Error: Encoded img DOES NOT matches original img")
 
     outdata_python = encode_np_array(indata)
-    time_taken = timeit.timeit("indata = np.load('image.npy').astype(np.uint8); encode_np_array(indata)",
-                               number=10, globals=globals()) / 10
+    time_taken = timeit.timeit("encode_np_array(indata)",
+                               number=10, globals={**globals(), "indata": indata}) / 10
     print(f"python {time_taken:.4f}s or {time_taken*1000:.2f}ms")
-    print("Output from c func", np.array(outdata_python), len(outdata_python))
+    print("Output from python func", np.array(outdata_python), len(outdata_python))
 
     # check if encoded arr matches the orig image
     dec = decode_np_array(outdata_python)
     print("Encoded img matches original img"
           if dec == indata.tolist() else "Error: Encoded img DOES NOT matches original img")
 
+    outdata_np = encode_rle(indata)
+    time_taken = timeit.timeit("encode_rle(indata)",
+                               number=10, globals={**globals(), "indata": indata}) / 10
+    print(f"numpy vectorized {time_taken:.4f}s or {time_taken*1000:.2f}ms")
+    print("Output from numpy vectorized func", outdata_np, len(outdata_np))
+
+    # check if encoded arr matches the orig image and the c output
+    dec = decode_rle(outdata_np, shape=indata.shape)
+    print("Encoded img matches original img"
+          if np.array_equal(dec, indata) else "Error: Encoded img DOES NOT matches original img")
+    print("numpy and c outputs match"
+          if np.array_equal(outdata_np, outdata_c) else "Error: numpy and c outputs DO NOT match")
+
 
 if __name__ == "__main__":
     main()
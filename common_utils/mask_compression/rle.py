@@ -0,0 +1,120 @@
+"""
+Vectorized run-length encoding of segmentation masks
+
+The encoded layout matches the output of compress() in compress.c
+i.e. [0,0,0,1,1,1,1] => [0,3,1,4] as an interleaved [value, count, ...] array
+"""
+import numpy as np
+
+
+def get_run_starts(flat: np.ndarray) -> np.ndarray:
+    """
+    returns the start index of every run in a flat array
+    """
+    if flat.size == 0:
+        return np.empty(0, dtype=np.intp)
+    bounds = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    return np.concatenate(([0], bounds))
+
+
+def encode_rle(arr: np.ndarray, dtype=np.int32) -> np.ndarray:
+    """
+    encode an ndarray of any shape (read in C order) into [value, count, ...] runs
+        arr: uint8 mask array
+        dtype: dtype of the encoded arr, np.int32 matches compress.c, np.uint32 is also valid
+    """
+    flat = np.asarray(arr).reshape(-1)
+    starts = get_run_starts(flat)
+    encoded_arr = np.empty(2 * len(starts), dtype=dtype)
+    encoded_arr[0::2] = flat[starts]
+    encoded_arr[1::2] = np.diff(starts, append=flat.size)
+    return encoded_arr
+
+
+def decode_rle(encoded_arr, shape=None, dtype=np.uint8) -> np.ndarray:
+    """
+    decode [value, count, ...] runs into a flat array or an array with shape
+    """
+    encoded_arr = np.asarray(encoded_arr)
+    decoded_arr = np.repeat(encoded_arr[0::2].astype(dtype), encoded_arr[1::2])
+    if shape is not None:
+        decoded_arr = decoded_arr.reshape(shape)
+    return decoded_arr
+
+
+def coco_counts_to_string(counts) -> str:
+    """
+    compress COCO RLE counts into the compact LEB128-like string used by pycocotools
+    each count is delta coded against the count two positions back after the first three,
+    then written as 5-bit chunks offset by 48 with bit 0x20 as the continuation flag
+    """
+    chars = []
+    for i, x in enumerate(counts):
+        x = int(x)
+        if i > 2:
+            x -= int(counts[i - 2])
+        more = True
+        while more:
+            c = x & 0x1f
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return "".join(chars)
+
+
+def coco_string_to_counts(rle_str) -> list:
+    """
+    decompress the compact COCO RLE string into a list of counts
+    """
+    if isinstance(rle_str, bytes):
+        rle_str = rle_str.decode("ascii")
+    counts = []
+    p = 0
+    while p < len(rle_str):
+        x = 0
+        k = 0
+        more = True
+        while more:
+            c = ord(rle_str[p]) - 48
+            x |= (c & 0x1f) << (5 * k)
+            more = c & 0x20
+            p += 1
+            k += 1
+            if not more and c & 0x10:
+                x |= -1 << (5 * k)
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
+
+
+def encode_coco_rle(mask: np.ndarray, compact: bool = False) -> dict:
+    """
+    encode a (H, W) binary mask into a COCO RLE dict {"size": [H, W], "counts": ...}
+    counts are column-major run lengths that alternate 0s and 1s starting with 0s,
+    all nonzero mask values are treated as 1
+        compact: if True, counts is the compact string form, otherwise a list of ints
+    """
+    mask = np.asarray(mask)
+    height, width = mask.shape[:2]
+    flat = (mask != 0).ravel(order="F")
+    starts = get_run_starts(flat)
+    counts = np.diff(starts, append=flat.size).tolist()
+    if flat.size and flat[0]:
+        counts.insert(0, 0)  # counts always begin with a run of 0s
+    return {"size": [height, width],
+            "counts": coco_counts_to_string(counts) if compact else counts}
+
+
+def decode_coco_rle(rle: dict) -> np.ndarray:
+    """
+    decode a COCO RLE dict with list or compact string counts into a (H, W) uint8 mask
+    """
+    height, width = rle["size"]
+    counts = rle["counts"]
+    if isinstance(counts, (str, bytes)):
+        counts = coco_string_to_counts(counts)
+    values = (np.arange(len(counts)) % 2).astype(np.uint8)
+    return np.repeat(values, counts).reshape((height, width), order="F")
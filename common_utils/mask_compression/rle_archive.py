@@ -0,0 +1,140 @@
+"""
+Single file archive of RLE encoded masks with a random access index
+
+File layout:
+    header  HEADER_DTYPE record padded to HEADER_SIZE bytes
+    runs    contiguous [value, count, ...] runs of all masks in run_dtype
+    index   INDEX_DTYPE record per mask with the offset & length of its runs and its shape
+
+The runs and index are opened with np.memmap so reading mask #N only touches its pages
+
+Sample Usage:
+    with RLEArchiveWriter("masks.rlea") as writer:
+        for mask in masks:
+            writer.add_mask(mask)
+
+    archive = RLEArchive("masks.rlea")
+    runs = archive[10]          # zero-copy view of the runs of mask 10
+    mask = archive.decode(10)   # decoded mask with its original shape
+"""
+import numpy as np
+
+from rle import encode_rle, decode_rle
+
+
+MAGIC = b"RLEARCH1"
+VERSION = 1
+MAX_NDIM = 4
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([("magic", "S8"),
+                         ("version", "<u8"),
+                         ("n_masks", "<u8"),
+                         ("run_dtype", "S8"),
+                         ("runs_offset", "<u8"),
+                         ("index_offset", "<u8")])
+INDEX_DTYPE = np.dtype([("offset", "<i8"),
+                        ("length", "<i8"),
+                        ("ndim", "<i8"),
+                        ("shape", "<i8", (MAX_NDIM,))])
+
+
+class RLEArchiveWriter:
+    def __init__(self, path, run_dtype=np.int32):
+        """Streams encoded masks to an archive file, the index is written on close
+        """
+        self.path = path
+        self.run_dtype = np.dtype(run_dtype).newbyteorder("<")
+        self.fptr = open(path, "wb")
+        self.fptr.write(b"\0" * HEADER_SIZE)
+        self.index = []
+        self.n_runs = 0
+
+    def add(self, encoded_arr, shape) -> int:
+        """
+        add [value, count, ...] runs of a mask with shape, returns the mask id
+        """
+        if len(shape) > MAX_NDIM:
+            raise ValueError(f"Masks with more than {MAX_NDIM} dims are not supported")
+        encoded_arr = np.ascontiguousarray(encoded_arr, dtype=self.run_dtype)
+        self.fptr.write(memoryview(encoded_arr).cast("B"))
+        self.index.append((self.n_runs, len(encoded_arr), len(shape),
+                           tuple(shape) + (0,) * (MAX_NDIM - len(shape))))
+        self.n_runs += len(encoded_arr)
+        return len(self.index) - 1
+
+    def add_mask(self, mask) -> int:
+        """
+        encode and add a mask, returns the mask id
+        """
+        mask = np.asarray(mask)
+        return self.add(encode_rle(mask, dtype=self.run_dtype), mask.shape)
+
+    def close(self):
+        if self.fptr.closed:
+            return
+        index_offset = HEADER_SIZE + self.n_runs * self.run_dtype.itemsize
+        self.fptr.write(np.array(self.index, dtype=INDEX_DTYPE).tobytes())
+        header = np.array((MAGIC, VERSION, len(self.index), self.run_dtype.str.encode(),
+                           HEADER_SIZE, index_offset), dtype=HEADER_DTYPE)
+        self.fptr.seek(0)
+        self.fptr.write(header.tobytes())
+        self.fptr.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RLEArchive:
+    def __init__(self, path):
+        """Read-only memory-mapped view of an archive written by RLEArchiveWriter
+        """
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header["magic"][0] != MAGIC:
+            raise ValueError(f"{path} is not a RLE mask archive")
+        header = header[0]
+        if header["version"] != VERSION:
+            raise ValueError(f"RLE mask archive version {header['version']} is not supported")
+
+        self.path = path
+        self.run_dtype = np.dtype(header["run_dtype"].decode())
+        n_masks = int(header["n_masks"])
+        runs_offset, index_offset = int(header["runs_offset"]), int(header["index_offset"])
+        n_runs = (index_offset - runs_offset) // self.run_dtype.itemsize
+
+        # np.memmap cannot map zero bytes
+        self.runs = np.memmap(path, dtype=self.run_dtype, mode="r",
+                              offset=runs_offset, shape=(n_runs,)) \
+            if n_runs else np.empty(0, dtype=self.run_dtype)
+        self.index = np.memmap(path, dtype=INDEX_DTYPE, mode="r",
+                               offset=index_offset, shape=(n_masks,)) \
+            if n_masks else np.empty(0, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, mask_id) -> np.ndarray:
+        """
+        zero-copy view of the [value, count, ...] runs of mask_id
+        """
+        entry = self.index[mask_id]
+        offset = int(entry["offset"])
+        return self.runs[offset:offset + int(entry["length"])]
+
+    def shape(self, mask_id) -> tuple:
+        entry = self.index[mask_id]
+        return tuple(int(s) for s in entry["shape"][:entry["ndim"]])
+
+    def decode(self, mask_id, dtype=np.uint8) -> np.ndarray:
+        return decode_rle(self[mask_id], shape=self.shape(mask_id), dtype=dtype)
+
+
+def write_rle_archive(path, masks, run_dtype=np.int32) -> None:
+    """
+    encode an iterable of masks into an archive at path
+    """
+    with RLEArchiveWriter(path, run_dtype=run_dtype) as writer:
+        for mask in masks:
+            writer.add_mask(mask)
@@ -0,0 +1,140 @@
+"""
+Mask statistics and set operations computed directly on [value, count, ...] runs
+from encode_rle/compress without decoding to H x W arrays
+
+value args select the foreground, if None all nonzero values are foreground
+"""
+import numpy as np
+
+from rle import get_run_starts
+
+
+def split_runs(encoded_arr):
+    """
+    split [value, count, ...] runs into values and int64 counts arrays
+    """
+    encoded_arr = np.asarray(encoded_arr)
+    return encoded_arr[0::2], encoded_arr[1::2].astype(np.int64)
+
+
+def join_runs(values, counts, dtype=np.int32) -> np.ndarray:
+    """
+    join values and counts into [value, count, ...] runs, adjacent runs with equal values
+    and zero length runs are merged so the output matches encode_rle of the decoded mask
+    """
+    keep = counts > 0
+    values, counts = values[keep], counts[keep]
+    starts = get_run_starts(values)
+    encoded_arr = np.empty(2 * len(starts), dtype=dtype)
+    encoded_arr[0::2] = values[starts]
+    encoded_arr[1::2] = np.add.reduceat(counts, starts) if len(starts) else counts
+    return encoded_arr
+
+
+def _fg(values, value=None):
+    return values != 0 if value is None else values == value
+
+
+def rle_area(encoded_arr, value=None) -> int:
+    """
+    number of foreground pixels
+    """
+    values, counts = split_runs(encoded_arr)
+    return int(counts[_fg(values, value)].sum())
+
+
+def rle_class_counts(encoded_arr, num_classes=256) -> np.ndarray:
+    """
+    number of pixels of each class value, returns a (num_classes,) int64 array
+    """
+    values, counts = split_runs(encoded_arr)
+    class_counts = np.zeros(num_classes, dtype=np.int64)
+    np.add.at(class_counts, values.astype(np.intp), counts)
+    return class_counts
+
+
+def rle_bbox(encoded_arr, width, value=None) -> tuple:
+    """
+    bounding box of the foreground of a row-major encoded mask with given width
+    returns (min_x, min_y, box_width, box_height) as in COCO, or (0, 0, 0, 0) for an empty mask
+    """
+    values, counts = split_runs(encoded_arr)
+    ends = np.cumsum(counts)
+    fg = _fg(values, value) & (counts > 0)
+    if not fg.any():
+        return (0, 0, 0, 0)
+    run_last = ends[fg] - 1
+    run_first = run_last - counts[fg] + 1
+    first_row, last_row = run_first // width, run_last // width
+    # runs that wrap onto the next row cover every column
+    wraps = last_row > first_row
+    min_x = 0 if wraps.any() else int((run_first % width).min())
+    max_x = width - 1 if wraps.any() else int((run_last % width).max())
+    min_y, max_y = int(first_row.min()), int(last_row.max())
+    return (min_x, min_y, max_x - min_x + 1, max_y - min_y + 1)
+
+
+def align_runs(encoded_a, encoded_b):
+    """
+    split two encodings of the same sized mask at the union of their run boundaries
+    returns (values_a, values_b, lengths) where both masks are constant over each segment
+    """
+    values_a, counts_a = split_runs(encoded_a)
+    values_b, counts_b = split_runs(encoded_b)
+    ends_a, ends_b = np.cumsum(counts_a), np.cumsum(counts_b)
+    size_a = ends_a[-1] if len(ends_a) else 0
+    size_b = ends_b[-1] if len(ends_b) else 0
+    if size_a != size_b:
+        raise ValueError(f"encoded masks have different sizes {size_a} and {size_b}")
+
+    ends = np.union1d(ends_a, ends_b)
+    lengths = np.diff(ends, prepend=0)
+    return (values_a[np.searchsorted(ends_a, ends)],
+            values_b[np.searchsorted(ends_b, ends)],
+            lengths)
+
+
+def rle_intersection(encoded_a, encoded_b, value=None) -> int:
+    """
+    number of pixels in the foreground of both masks
+    """
+    values_a, values_b, lengths = align_runs(encoded_a, encoded_b)
+    return int(lengths[_fg(values_a, value) & _fg(values_b, value)].sum())
+
+
+def rle_union(encoded_a, encoded_b, value=None) -> int:
+    """
+    number of pixels in the foreground of either mask
+    """
+    values_a, values_b, lengths = align_runs(encoded_a, encoded_b)
+    return int(lengths[_fg(values_a, value) | _fg(values_b, value)].sum())
+
+
+def rle_iou(encoded_a, encoded_b, value=None) -> float:
+    """
+    intersection over union of the foreground of two masks, 0 if both are empty
+    """
+    values_a, values_b, lengths = align_runs(encoded_a, encoded_b)
+    fg_a, fg_b = _fg(values_a, value), _fg(values_b, value)
+    union = lengths[fg_a | fg_b].sum()
+    return float(lengths[fg_a & fg_b].sum() / union) if union else 0.0
+
+
+def rle_merge(encoded_a, encoded_b, mode="union", value=None) -> np.ndarray:
+    """
+    merge two masks into a new [value, count, ...] encoding
+        mode: union:        1 where either foreground is set, else 0
+              intersection: 1 where both foregrounds are set, else 0
+              overwrite:    values of b where the foreground of b is set, else values of a
+    """
+    values_a, values_b, lengths = align_runs(encoded_a, encoded_b)
+    fg_a, fg_b = _fg(values_a, value), _fg(values_b, value)
+    if mode == "union":
+        values = (fg_a | fg_b).astype(np.uint8)
+    elif mode == "intersection":
+        values = (fg_a & fg_b).astype(np.uint8)
+    elif mode == "overwrite":
+        values = np.where(fg_b, values_b, values_a)
+    else:
+        raise ValueError(f"{mode} merge mode is not supported")
+    return join_runs(values, lengths, dtype=np.asarray(encoded_a).dtype)
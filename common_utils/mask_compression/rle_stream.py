@@ -0,0 +1,84 @@
+"""
+Streaming RLE encoding of masks that do not fit in memory
+
+Chunks (i.e. row blocks of a np.memmap or tiles from a row-wise reader) are encoded one at a time
+and the open run at the end of each chunk is carried over into the next chunk,
+so the output is identical to encode_rle of the whole flattened mask
+
+Sample Usage:
+    mask = np.load("slide_mask.npy", mmap_mode="r")
+    runs = encode_rle_stream(iter_row_blocks(mask, rows_per_block=1024))
+"""
+import numpy as np
+
+from rle import encode_rle
+
+
+class StreamingRLEEncoder:
+    def __init__(self, dtype=np.int64):
+        """Stateful [value, count, ...] encoder fed with consecutive chunks of a mask
+        dtype defaults to int64 as runs of gigapixel masks can exceed the int32 range
+        """
+        self.dtype = dtype
+        self.open_value = None
+        self.open_count = 0
+        self.n_pixels = 0
+
+    def update(self, chunk) -> np.ndarray:
+        """
+        encode the next chunk (read in C order), returns the runs closed by this chunk
+        """
+        flat = np.asarray(chunk).reshape(-1)
+        if flat.size == 0:
+            return np.empty(0, dtype=self.dtype)
+        self.n_pixels += flat.size
+
+        runs = encode_rle(flat, dtype=np.int64)
+        if self.open_count:
+            if runs[0] == self.open_value:
+                runs[1] += self.open_count
+            else:
+                runs = np.concatenate(([self.open_value, self.open_count], runs))
+        # the last run may continue in the next chunk
+        self.open_value, self.open_count = int(runs[-2]), int(runs[-1])
+        return runs[:-2].astype(self.dtype)
+
+    def flush(self) -> np.ndarray:
+        """
+        returns the open run at the end of the mask and resets the encoder
+        """
+        runs = np.array([self.open_value, self.open_count] if self.open_count else [],
+                        dtype=self.dtype)
+        self.open_value, self.open_count, self.n_pixels = None, 0, 0
+        return runs
+
+
+def iter_row_blocks(arr, rows_per_block=1024):
+    """
+    yield consecutive row blocks of an ndarray or np.memmap without loading the whole array
+    """
+    for i in range(0, len(arr), rows_per_block):
+        yield arr[i:i + rows_per_block]
+
+
+def encode_rle_chunks(chunks, dtype=np.int64):
+    """
+    generator of runs, yields the runs closed after each chunk and the final open run
+    """
+    encoder = StreamingRLEEncoder(dtype=dtype)
+    for chunk in chunks:
+        runs = encoder.update(chunk)
+        if len(runs):
+            yield runs
+    runs = encoder.flush()
+    if len(runs):
+        yield runs
+
+
+def encode_rle_stream(chunks, dtype=np.int64) -> np.ndarray:
+    """
+    encode all chunks into a single [value, count, ...] array
+    only the runs and one chunk are held in memory at a time
+    """
+    runs_list = list(encode_rle_chunks(chunks, dtype=dtype))
+    return np.concatenate(runs_list) if runs_list else np.empty(0, dtype=dtype)
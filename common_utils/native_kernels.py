@@ -0,0 +1,79 @@
+"""
+Shared loader for the C kernels in common_utils
+
+Shared libraries are located next to the calling module (or in NATIVE_LIB_PATH dirs),
+loaded once and cached, and each kernel's argtypes/restype are declared once.
+Array arguments are declared with array_arg so ctypes rejects arrays with the wrong dtype,
+ndim, non-contiguous memory or read-only outputs with an ArgumentError before the C call,
+instead of silently reading a strided buffer or writing into a temporary copy.
+
+Sample Usage:
+    import os.path as osp
+    from native_kernels import array_arg, get_kernel
+
+    compress = get_kernel("compress", "compress",
+                          argtypes=[array_arg(np.uint8), ctypes.c_size_t,
+                                    array_arg(np.int32, writeable=True), ctypes.c_size_t],
+                          restype=ctypes.c_int32,
+                          search_dirs=[osp.dirname(osp.abspath(__file__))])
+"""
+import os
+import sys
+import ctypes
+import os.path as osp
+from functools import lru_cache
+
+from numpy.ctypeslib import ndpointer
+
+
+LIB_EXTN = {"darwin": ".dylib", "win32": ".dll"}.get(sys.platform, ".so")
+_KERNELS = {}
+
+
+def array_arg(dtype, ndim=None, writeable=False):
+    """
+    ctypes argtype for a C contiguous numpy array of dtype,
+    set writeable for arrays the kernel writes to
+    """
+    flags = "C_CONTIGUOUS,WRITEABLE" if writeable else "C_CONTIGUOUS"
+    return ndpointer(dtype, ndim=ndim, flags=flags)
+
+
+def find_library(lib_name, search_dirs=()) -> str:
+    """
+    returns the path to lib{lib_name}.so (.dylib/.dll) from search_dirs,
+    the dirs in the NATIVE_LIB_PATH env var (os.pathsep separated) and the current dir
+    """
+    env_dirs = [d for d in os.environ.get("NATIVE_LIB_PATH", "").split(os.pathsep) if d]
+    fname = f"lib{lib_name}{LIB_EXTN}"
+    for lib_dir in [*search_dirs, *env_dirs, os.getcwd()]:
+        path = osp.join(lib_dir, fname)
+        if osp.isfile(path):
+            return osp.abspath(path)
+    raise FileNotFoundError(
+        f"{fname} not found in {[*search_dirs, *env_dirs, os.getcwd()]}. "
+        "Build it first with make in the kernel source dir")
+
+
+@lru_cache(maxsize=None)
+def load_library(path) -> ctypes.CDLL:
+    """
+    loads a shared library once, later calls return the cached handle
+    """
+    return ctypes.CDLL(path)
+
+
+def get_kernel(lib_name, func_name, argtypes, restype=None, search_dirs=()):
+    """
+    returns the cached ctypes function func_name from lib{lib_name} with argtypes & restype set
+    ctypes functions release the GIL while the kernel runs
+    """
+    key = (lib_name, func_name, tuple(search_dirs))
+    kernel = _KERNELS.get(key)
+    if kernel is None:
+        lib = load_library(find_library(lib_name, search_dirs))
+        kernel = getattr(lib, func_name)
+        kernel.argtypes = list(argtypes)
+        kernel.restype = restype
+        _KERNELS[key] = kernel
+    return kernel
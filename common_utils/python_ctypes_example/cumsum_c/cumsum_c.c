@@ -1,35 +1,102 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <stdint.h>
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+
+/* integral image (2D inclusive cumsum) of n contiguous (h, w, c) images
+   out[b][i][j][k] = sum of in[b][:i+1][:j+1][k]
+   out may be the same buffer as in for an in-place integral when IN_T == OUT_T
+   each row only reads the previous integral row, so memory is swept once in row-major order
+ */
+#define DEFINE_INTEGRAL(NAME, IN_T, OUT_T, ACC_T)                                  \
+void NAME(const IN_T *in, OUT_T *out, size_t n, size_t h, size_t w, size_t c)   \
+{                                                                              \
+    size_t b, i, j, k, idx;                                                    \
+    size_t row_len = w * c;                                                    \
+    ACC_T row_sum[c > 0 ? c : 1];                                              \
+    for (b = 0; b < n; b++) {                                                  \
+        const IN_T *src = in + b * h * row_len;                                \
+        OUT_T *dst = out + b * h * row_len;                                    \
+        for (i = 0; i < h; i++) {                                              \
+            for (k = 0; k < c; k++)                                            \
+                row_sum[k] = 0;                                                \
+            for (j = 0; j < row_len; j += c) {                                 \
+                for (k = 0; k < c; k++) {                                      \
+                    idx = i * row_len + j + k;                                 \
+                    row_sum[k] += src[idx];                                    \
+                    dst[idx] = i > 0 ? row_sum[k] + dst[idx - row_len]         \
+                                     : row_sum[k];                             \
+                }                                                              \
+            }                                                                  \
+        }                                                                      \
+    }                                                                          \
+}
+
+DEFINE_INTEGRAL(integral_f64, double, double, double)
+DEFINE_INTEGRAL(integral_f32, float, float, double)
+DEFINE_INTEGRAL(integral_u8, uint8_t, int64_t, int64_t)
 
 
 // n must be passed before the 2D array, C99 compitable compiler required
 void cumsum_2d(size_t r, size_t c, double matrix[][c])
 {
-    // cum sum in first col
-    for (int i = 1; i < r; i++)
-        matrix[i][0] = matrix[i - 1][0] + matrix[i][0];
-    // cum sum in first row
-    for (int i = 1; i < c; i++)
-        matrix[0][i] = matrix[0][i - 1] + matrix[0][i];
-
-    for (int i = 1; i < r; i++) {
-      for (int j = 1; j < c; j++)
-        if (i > j)  {
-          matrix[i][j] = matrix[j][i];
+    // in-place integral of a single channel matrix
+    integral_f64(&matrix[0][0], &matrix[0][0], 1, r, c, 1);
+}
+
+
+/* cache-blocked, multi-threaded in-place integral of a (r, c) row-major matrix
+   pass 1: prefix sum along each row, rows are split across threads
+   pass 2: prefix sum down each column stripe of block_cols columns, stripes are split across threads.
+           each thread sweeps its stripe row by row so it only touches two short contiguous
+           row segments at a time instead of striding down whole columns
+   num_threads <= 0 uses the OpenMP default (OMP_NUM_THREADS or all cores)
+ */
+void cumsum_2d_blocked(size_t r, size_t c, double *matrix, size_t block_cols, int num_threads)
+{
+    long long i, jb;
+    size_t j, jend;
+    double row_sum;
+    if (block_cols == 0)
+        block_cols = 512;
+#ifdef _OPENMP
+    if (num_threads <= 0)
+        num_threads = omp_get_max_threads();
+#else
+    num_threads = 1;
+#endif
+
+    #pragma omp parallel for num_threads(num_threads) schedule(static) private(j, row_sum)
+    for (i = 0; i < (long long)r; i++) {
+        double *row = matrix + i * c;
+        row_sum = 0;
+        for (j = 0; j < c; j++) {
+            row_sum += row[j];
+            row[j] = row_sum;
         }
-        else {
-          matrix[i][j] = matrix[i- 1][j] + matrix[i][j- 1] - matrix[i- 1][j- 1] + matrix[i][j];
+    }
+
+    #pragma omp parallel for num_threads(num_threads) schedule(static) private(i, j, jend)
+    for (jb = 0; jb < (long long)c; jb += block_cols) {
+        jend = (size_t)jb + block_cols < c ? (size_t)jb + block_cols : c;
+        for (i = 1; i < (long long)r; i++) {
+            double *row = matrix + i * c;
+            const double *prev_row = row - c;
+            for (j = (size_t)jb; j < jend; j++)
+                row[j] += prev_row[j];
         }
-      }
+    }
 }
 
 
 int main() {
-        double arr[][3] = {{1, 2, 3}, {2, 5, 4}, {3, 4, 10}};
+        double arr[][3] = {{1, 2, 3}, {2, 5, 4}, {7, 4, 10}};
         size_t r = 3, c = 3;
         cumsum_2d(r, c, arr);
-        int i, j;
+        size_t i, j;
         for (i = 0; i < r; i++) {
             for (j = 0; j < c; j++) {
                 printf("%f ", arr[i][j]);
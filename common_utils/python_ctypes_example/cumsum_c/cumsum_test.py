@@ -1,18 +1,38 @@
-#  compresses segmentation masks
+#  2D cumulative sum (integral image) with C kernels
 
+import sys
+import time
 import ctypes
 import timeit
+import argparse
+import os.path as osp
 import numpy as np
-from numpy.ctypeslib import ndpointer
 
+LIB_DIR = osp.dirname(osp.abspath(__file__))
+sys.path.append(osp.dirname(osp.dirname(LIB_DIR)))
+from native_kernels import array_arg, get_kernel  # noqa: E402
 
-def _get_cumsum_func(shared_lib_path="./libcumsum.so"):
-    lib = ctypes.cdll.LoadLibrary(shared_lib_path)
-    cumsum_func = lib.cumsum_2d
-    cumsum_func.argtypes = [ctypes.c_size_t,
-                            ctypes.c_size_t,
-                            ndpointer(ctypes.c_double)]
-    return cumsum_func
+
+def _get_cumsum_func():
+    """ input matrix must be a contiguous 2D float64 array, it is modified in-place
+    """
+    return get_kernel("cumsum", "cumsum_2d",
+                      argtypes=[ctypes.c_size_t,
+                                ctypes.c_size_t,
+                                array_arg(np.float64, ndim=2, writeable=True)],
+                      search_dirs=[LIB_DIR])
+
+
+def _get_cumsum_blocked_func():
+    """ cache-blocked, multi-threaded variant of cumsum_2d, modifies the matrix in-place
+    """
+    return get_kernel("cumsum", "cumsum_2d_blocked",
+                      argtypes=[ctypes.c_size_t,
+                                ctypes.c_size_t,
+                                array_arg(np.float64, ndim=2, writeable=True),
+                                ctypes.c_size_t,
+                                ctypes.c_int],
+                      search_dirs=[LIB_DIR])
 
 
 def cumsum_calc(in_matrix, func):
@@ -20,7 +40,52 @@ def cumsum_calc(in_matrix, func):
     func(r, c, in_matrix)
 
 
+def cumsum_calc_blocked(in_matrix, func, block_cols=512, num_threads=0):
+    """ num_threads <= 0 uses all cores (or OMP_NUM_THREADS)
+    """
+    r, c = in_matrix.shape
+    func(r, c, in_matrix, block_cols, num_threads)
+
+
+def bench_sizes(sizes, repeat=3, block_cols=512, num_threads=0):
+    """ compare numpy, naive C and blocked C 2D cumsums over square matrices of each size
+    reports the median time and throughput as GB of matrix data processed per second
+    """
+    naive_func, blocked_func = _get_cumsum_func(), _get_cumsum_blocked_func()
+    funcs = {"numpy": lambda m: np.cumsum(np.cumsum(m, 0), 1),
+             "C naive": lambda m: cumsum_calc(m, naive_func),
+             "C blocked": lambda m: cumsum_calc_blocked(m, blocked_func, block_cols, num_threads)}
+    print(f"{'size':>13} {'method':>10} {'median ms':>12} {'GB/s':>8}")
+    for size in sizes:
+        orig = np.random.default_rng(0).random((size, size))
+        matrix = np.empty_like(orig)
+        expected = np.cumsum(np.cumsum(orig, 0), 1)
+        for name, func in funcs.items():
+            times = []
+            for _ in range(repeat):
+                np.copyto(matrix, orig)  # in-place funcs need a fresh matrix, not timed
+                t1 = time.perf_counter()
+                out = func(matrix)
+                times.append(time.perf_counter() - t1)
+            out = matrix if out is None else out
+            ok = np.allclose(out, expected)
+            median = float(np.median(times))
+            print(f"{size:>6}x{size:<6} {name:>10} {median * 1000:>12.3f} "
+                  f"{orig.nbytes / median / 1e9:>8.2f}{'' if ok else '  MISMATCH'}")
+        del orig, matrix, expected
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Benchmark 2D cumsum implementations")
+    parser.add_argument("--max_size", type=int, default=4096,
+                        help="Largest matrix side benchmarked, up to 16384 (needs ~6GB RAM). (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timed calls per measurement. (default: %(default)s)")
+    parser.add_argument("--block_cols", type=int, default=512,
+                        help="Column stripe width of the blocked kernel. (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="Threads of the blocked kernel, 0 uses all cores. (default: %(default)s)")
+    args = parser.parse_args()
     # N = 5
     # temp = np.random.random_integers(0, 10, size=(N, N))
     # matrix_sym = (temp + temp.T) / 2
@@ -38,7 +103,10 @@ def main():
     print("numpy cumsum", np.cumsum(np.cumsum(matrix2, 0), 1))
     time_taken = timeit.timeit("np.cumsum(np.cumsum(np.array([[1, 2, 3], [2, 5, 4], [3, 4, 10]], dtype=np.double), 0), 1)",
                                number=10, globals=globals()) / 10
-    print(f"C cumsum time: {time_taken:.4f}s or {time_taken*1000:.2f}ms")
+    print(f"numpy cumsum time: {time_taken:.4f}s or {time_taken*1000:.2f}ms")
+
+    sizes = [s for s in (3, 64, 256, 1024, 4096, 8192, 16384) if s <= args.max_size]
+    bench_sizes(sizes, args.repeat, args.block_cols, args.threads)
 
 
 if __name__ == "__main__":
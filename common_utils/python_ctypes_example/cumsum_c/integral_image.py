@@ -0,0 +1,132 @@
+"""
+Integral images (summed-area tables) on the native cumsum kernels with O(1) box queries
+
+Supported inputs are (H, W), (H, W, C), batched (N, H, W) and (N, H, W, C) arrays of
+    uint8   -> int64 integral (exact)
+    float32 -> float32 integral (in-place allowed)
+    float64 -> float64 integral (in-place allowed)
+
+Boxes are (x_min, y_min, x_max, y_max) with exclusive maxima like numpy slicing,
+i.e. box_sum(integral, [[x0, y0, x1, y1]]) == arr[y0:y1, x0:x1].sum()
+
+Sample Usage:
+    make
+    integral = integral_image(mask)                # (H, W) uint8 mask -> (H, W) int64
+    coverage = box_mean(integral, boxes)           # fraction of mask pixels in each box
+    integral_image(img_f32, out=img_f32)           # in-place
+    integrals = integral_image(masks, batched=True)
+    sums = box_sum(integrals[3], boxes)
+"""
+import sys
+import ctypes
+import os.path as osp
+
+import numpy as np
+
+LIB_DIR = osp.dirname(osp.abspath(__file__))
+sys.path.append(osp.dirname(osp.dirname(LIB_DIR)))
+from native_kernels import array_arg, get_kernel  # noqa: E402
+
+
+# input dtype: (kernel name, output dtype)
+INTEGRAL_KERNELS = {np.dtype(np.uint8): ("integral_u8", np.dtype(np.int64)),
+                    np.dtype(np.float32): ("integral_f32", np.dtype(np.float32)),
+                    np.dtype(np.float64): ("integral_f64", np.dtype(np.float64))}
+
+
+def _get_integral_func(in_dtype):
+    kernel_name, out_dtype = INTEGRAL_KERNELS[in_dtype]
+    return get_kernel("cumsum", kernel_name,
+                      argtypes=[array_arg(in_dtype),
+                                array_arg(out_dtype, writeable=True),
+                                ctypes.c_size_t, ctypes.c_size_t, ctypes.c_size_t, ctypes.c_size_t],
+                      search_dirs=[LIB_DIR])
+
+
+def _as_nhwc(shape, batched):
+    """
+    returns (n, h, w, c) of an input shape
+    """
+    if batched:
+        if len(shape) == 3:
+            return (*shape, 1)
+        if len(shape) == 4:
+            return tuple(shape)
+    else:
+        if len(shape) == 2:
+            return (1, *shape, 1)
+        if len(shape) == 3:
+            return (1, *shape)
+    raise ValueError(f"Unsupported input shape {shape} with batched={batched}")
+
+
+def integral_image(arr, out=None, batched=False) -> np.ndarray:
+    """
+    compute the inclusive integral image over the H and W axes
+        arr: (H, W) or (H, W, C) array, or (N, H, W) or (N, H, W, C) if batched
+        out: optional output array, pass out=arr for an in-place float integral
+        batched: if True, the first axis of arr is the batch axis
+    """
+    if arr.dtype not in INTEGRAL_KERNELS:
+        raise TypeError(f"{arr.dtype} is not supported, use one of {list(INTEGRAL_KERNELS)}")
+    out_dtype = INTEGRAL_KERNELS[arr.dtype][1]
+    n, h, w, c = _as_nhwc(arr.shape, batched)
+
+    if out is None:
+        out = np.empty(arr.shape, dtype=out_dtype)
+    elif out.shape != arr.shape or out.dtype != out_dtype:
+        raise ValueError(f"out must have shape {arr.shape} and dtype {out_dtype}")
+    # in-place requires the input and output to be the same contiguous buffer
+    arr = arr if out is arr else np.ascontiguousarray(arr)
+
+    _get_integral_func(arr.dtype)(arr, out, n, h, w, c)
+    return out
+
+
+def box_sum(integral, boxes) -> np.ndarray:
+    """
+    sum of the original array inside each box in O(1) per box
+        integral: (H, W) or (H, W, C) output of integral_image for a single image
+        boxes: (K, 4) array of (x_min, y_min, x_max, y_max), clipped to the image
+    returns a (K,) or (K, C) array
+    """
+    h, w = integral.shape[:2]
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    x0 = np.clip(boxes[:, 0], 0, w) - 1
+    y0 = np.clip(boxes[:, 1], 0, h) - 1
+    x1 = np.clip(boxes[:, 2], 0, w) - 1
+    y1 = np.clip(boxes[:, 3], 0, h) - 1
+
+    def _at(ys, xs):
+        # integral value at (ys, xs), 0 left of or above the image
+        vals = integral[np.maximum(ys, 0), np.maximum(xs, 0)]
+        vals[(ys < 0) | (xs < 0)] = 0
+        return vals
+
+    sums = _at(y1, x1) - _at(y0, x1) - _at(y1, x0) + _at(y0, x0)
+    # empty or inverted boxes
+    empty = (x1 <= x0) | (y1 <= y0)
+    sums[empty] = 0
+    return sums
+
+
+def box_area(boxes, height, width) -> np.ndarray:
+    """
+    number of pixels inside each box after clipping to the image
+    """
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    bw = np.clip(boxes[:, 2], 0, width) - np.clip(boxes[:, 0], 0, width)
+    bh = np.clip(boxes[:, 3], 0, height) - np.clip(boxes[:, 1], 0, height)
+    return np.maximum(bw, 0) * np.maximum(bh, 0)
+
+
+def box_mean(integral, boxes) -> np.ndarray:
+    """
+    mean of the original array inside each box, 0 for empty boxes
+    for a binary mask, this is the fraction of the box covered by the mask
+    """
+    sums = box_sum(integral, boxes).astype(np.float64)
+    area = box_area(boxes, *integral.shape[:2]).astype(np.float64)
+    if sums.ndim == 2:
+        area = area[:, None]
+    return np.divide(sums, area, out=np.zeros_like(sums), where=area > 0)
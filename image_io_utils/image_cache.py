@@ -0,0 +1,137 @@
+"""
+On-disk cache of decoded (and optionally downscaled) images with LRU size-bounded eviction
+
+Decoded images are saved as .npy files keyed by (path, mtime, file size, target size, mode),
+so edited images are decoded again. Cache hits are memory-mapped copy-on-write, they are
+returned without decoding and can be drawn on without modifying the cache file.
+The least recently used files are evicted once the cache grows past max_bytes.
+Command line tools enable the cache with the args added by add_cache_args, it is off by default.
+
+Sample Usage:
+    from image_cache import DecodedImageCache
+
+    cache = DecodedImageCache(".decoded_image_cache", max_bytes=2 * 1024 ** 3)
+    img = cache.read("image.jpg", target_size=(640, 480), mode="BGR")  # same args as read_image
+
+    add_cache_args(parser)
+    args = parser.parse_args()
+    image_cache = image_cache_from_args(args, output_dir=osp.dirname(args.csv_save_path))
+"""
+import os
+import hashlib
+import argparse
+import tempfile
+import os.path as osp
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from image_reader import read_image
+
+
+class DecodedImageCache:
+    def __init__(self, cache_dir: str = ".decoded_image_cache", max_bytes: int = 2 * 1024 ** 3):
+        """Decoded image cache in cache_dir, holding up to max_bytes of .npy files
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        # file name: size in bytes, least recently used first
+        self.entries = OrderedDict()
+        files = [entry for entry in os.scandir(cache_dir)
+                 if entry.is_file() and entry.name.endswith(".npy")]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime_ns):
+            self.entries[entry.name] = entry.stat().st_size
+        self.total_bytes = sum(self.entries.values())
+
+    @staticmethod
+    def _key(path: str, target_size, mode: str) -> str:
+        path = osp.abspath(path)
+        stat = os.stat(path)
+        target = "full" if target_size is None else "x".join(map(str, target_size))
+        key = f"{path}|{stat.st_mtime_ns}|{stat.st_size}|{target}|{mode}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest() + ".npy"
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self.entries:
+            name, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(osp.join(self.cache_dir, name))
+            except FileNotFoundError:  # already evicted by another process
+                pass
+
+    def _put(self, name: str, img: np.ndarray) -> None:
+        # write to a temp file first so that readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fptr:
+                np.save(fptr, img)
+            os.replace(tmp_path, osp.join(self.cache_dir, name))
+        finally:
+            if osp.exists(tmp_path):  # not replaced, e.g. the disk is full
+                os.remove(tmp_path)
+        self.entries[name] = osp.getsize(osp.join(self.cache_dir, name))
+        self.total_bytes += self.entries[name]
+        self._evict()
+
+    def read(self,
+             path: str,
+             target_size: Optional[Tuple[int, int]] = None,
+             mode: str = "RGB",
+             backend: Optional[str] = None) -> np.ndarray:
+        """
+        read_image through the cache, returns a copy-on-write memmap on cache hits
+        """
+        name = self._key(str(path), target_size, mode)
+        cache_path = osp.join(self.cache_dir, name)
+        if name in self.entries or osp.exists(cache_path):
+            try:
+                img = np.load(cache_path, mmap_mode="c")
+            except (FileNotFoundError, ValueError):  # evicted or partially written elsewhere
+                self.total_bytes -= self.entries.pop(name, 0)
+            else:
+                os.utime(cache_path)  # mtime tracks the last access for LRU across sessions
+                if name not in self.entries:  # added by another process
+                    self.entries[name] = osp.getsize(cache_path)
+                    self.total_bytes += self.entries[name]
+                self.entries.move_to_end(name)
+                return img
+
+        img = read_image(path, target_size, mode, backend=backend)
+        self._put(name, img)
+        return img
+
+    def clear(self) -> None:
+        self.max_bytes, max_bytes = 0, self.max_bytes
+        self._evict()
+        self.max_bytes = max_bytes
+
+
+def add_cache_args(parser: argparse.ArgumentParser) -> None:
+    """
+    add the decoded image cache args to a command line tool, the cache is disabled unless requested
+    """
+    parser.add_argument('--cache', action='store_true',
+                        help='cache decoded images in .decoded_image_cache under the output dir')
+    parser.add_argument('--cache_dir', type=str, default=None,
+                        help='dir of the decoded image cache, enables the cache')
+    parser.add_argument('--cache_size_gb', type=float, default=2,
+                        help='max size of the decoded image cache in GB. Default: 2')
+
+
+def image_cache_from_args(args: argparse.Namespace,
+                          output_dir: Optional[str] = None) -> Optional[DecodedImageCache]:
+    """
+    DecodedImageCache configured by the add_cache_args args, None if the cache is disabled
+        output_dir: dir the tool writes to, --cache stores the cache there
+    """
+    cache_dir = args.cache_dir
+    if cache_dir is None and args.cache:
+        if output_dir is None:
+            raise ValueError("--cache needs an output dir, pass --cache_dir instead")
+        cache_dir = osp.join(output_dir, ".decoded_image_cache")
+    if cache_dir is None:
+        return None
+    return DecodedImageCache(cache_dir, int(args.cache_size_gb * 1024 ** 3))
@@ -0,0 +1,227 @@
+"""
+Header-only image dimension probing for JPEG, PNG, BMP and WebP
+
+Only the file header is parsed (no pixel decoding), returning the width, height, channel count
+and EXIF orientation. Other formats fall back to PIL, which also only reads the header.
+
+ImageInfoCache persists probed info in a sqlite db keyed by (path, mtime, file size),
+so re-running a converter over the same dataset does not touch the images again.
+
+Sample Usage:
+    from image_info import get_image_info, ImageInfoCache
+
+    info = get_image_info("image.jpg")          # ImageInfo(width, height, channels, orientation)
+    width, height = info.oriented_size          # size after applying the EXIF orientation
+    with ImageInfoCache("image_info_cache.sqlite") as cache:
+        info = cache.get("image.jpg")
+"""
+import os
+import struct
+import sqlite3
+from typing import NamedTuple
+
+
+class ImageInfo(NamedTuple):
+    width: int
+    height: int
+    channels: int
+    orientation: int = 1  # EXIF orientation, 1 is upright
+
+    @property
+    def oriented_size(self):
+        """
+        (width, height) after applying the EXIF orientation, i.e. as returned by cv2.imread
+        """
+        if self.orientation in (5, 6, 7, 8):  # rotated by 90 or 270 deg
+            return self.height, self.width
+        return self.width, self.height
+
+
+# JPEG start of frame markers, excluding DHT (C4), JPG (C8) and DAC (CC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# PNG color type: channels
+PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+
+def _exif_orientation(tiff: bytes) -> int:
+    """
+    orientation tag (0x0112) from the IFD0 of TIFF formatted EXIF data
+    """
+    if len(tiff) < 8 or tiff[:2] not in (b"II", b"MM"):
+        return 1
+    endian = "<" if tiff[:2] == b"II" else ">"
+    ifd_offset = struct.unpack(endian + "I", tiff[4:8])[0]
+    if ifd_offset + 2 > len(tiff):
+        return 1
+    n_entries = struct.unpack(endian + "H", tiff[ifd_offset:ifd_offset + 2])[0]
+    for i in range(n_entries):
+        entry = tiff[ifd_offset + 2 + 12 * i:ifd_offset + 14 + 12 * i]
+        if len(entry) < 12:
+            break
+        tag, = struct.unpack(endian + "H", entry[:2])
+        if tag == 0x0112:
+            orientation, = struct.unpack(endian + "H", entry[8:10])
+            return orientation if 1 <= orientation <= 8 else 1
+    return 1
+
+
+def _probe_jpeg(fptr) -> ImageInfo:
+    orientation = 1
+    fptr.seek(2)
+    while True:
+        byte = fptr.read(1)
+        if not byte:
+            raise ValueError("JPEG ended before the start of frame marker")
+        if byte != b"\xff":
+            continue
+        marker = fptr.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = fptr.read(1)
+        marker = marker[0] if marker else 0xD9
+        if marker == 0xD9:
+            raise ValueError("JPEG ended before the start of frame marker")
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # markers without a length
+            continue
+        length, = struct.unpack(">H", fptr.read(2))
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width, channels = struct.unpack(">BHHB", fptr.read(6))
+            return ImageInfo(width, height, channels, orientation)
+        segment = fptr.read(length - 2)
+        if marker == 0xE1 and segment[:6] == b"Exif\0\0":
+            orientation = _exif_orientation(segment[6:])
+
+
+def _probe_png(fptr) -> ImageInfo:
+    fptr.seek(8)
+    length, chunk_type, width, height, _, color_type = struct.unpack(">I4sIIBB", fptr.read(18))
+    if chunk_type != b"IHDR":
+        raise ValueError("PNG IHDR chunk not found")
+    orientation = 1
+    pos = 8 + 12 + length  # length and type, data, CRC
+    while True:  # the eXIf chunk comes before the image data
+        fptr.seek(pos)
+        header = fptr.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"IDAT":
+            break
+        if chunk_type == b"eXIf":
+            exif = fptr.read(length)
+            orientation = _exif_orientation(exif[6:] if exif[:6] == b"Exif\0\0" else exif)
+            break
+        pos += 12 + length
+    return ImageInfo(width, height, PNG_CHANNELS.get(color_type, 3), orientation)
+
+
+def _probe_bmp(fptr) -> ImageInfo:
+    fptr.seek(14)
+    header_size, = struct.unpack("<I", fptr.read(4))
+    if header_size == 12:  # OS/2 BITMAPCOREHEADER
+        width, height, _, bpp = struct.unpack("<HHHH", fptr.read(8))
+    else:
+        width, height, _, bpp = struct.unpack("<iiHH", fptr.read(12))
+    # palette images (bpp <= 8) are decoded to 3 channels
+    return ImageInfo(abs(width), abs(height), 4 if bpp == 32 else 3)
+
+
+def _probe_webp(fptr) -> ImageInfo:
+    fptr.seek(12)
+    chunk_type, chunk_size = struct.unpack("<4sI", fptr.read(8))
+    data = fptr.read(10)
+    if chunk_type == b"VP8 ":
+        width, height = struct.unpack("<HH", data[6:10])
+        return ImageInfo(width & 0x3FFF, height & 0x3FFF, 3)
+    if chunk_type == b"VP8L":
+        bits, = struct.unpack("<I", data[1:5])
+        alpha = (bits >> 28) & 1
+        return ImageInfo((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, 4 if alpha else 3)
+    if chunk_type == b"VP8X":
+        flags = data[0]
+        width = int.from_bytes(data[4:7], "little") + 1
+        height = int.from_bytes(data[7:10], "little") + 1
+        orientation = 1
+        if flags & 0x08:  # EXIF chunk present
+            pos = 20 + chunk_size + (chunk_size & 1)
+            while True:
+                fptr.seek(pos)
+                header = fptr.read(8)
+                if len(header) < 8:
+                    break
+                sub_type, sub_size = struct.unpack("<4sI", header)
+                if sub_type == b"EXIF":
+                    exif = fptr.read(sub_size)
+                    orientation = _exif_orientation(exif[6:] if exif[:6] == b"Exif\0\0" else exif)
+                    break
+                pos += 8 + sub_size + (sub_size & 1)
+        return ImageInfo(width, height, 4 if flags & 0x10 else 3, orientation)
+    raise ValueError(f"Unknown WebP chunk {chunk_type}")
+
+
+def _probe_pil(path) -> ImageInfo:
+    from PIL import Image
+
+    with Image.open(path) as im:
+        orientation = im.getexif().get(0x0112, 1)
+        return ImageInfo(im.width, im.height, len(im.getbands()), orientation)
+
+
+def get_image_info(path) -> ImageInfo:
+    """
+    probe the width, height, channels and EXIF orientation of an image from its header
+    """
+    with open(path, "rb") as fptr:
+        head = fptr.read(16)
+        if head[:3] == b"\xff\xd8\xff":
+            return _probe_jpeg(fptr)
+        if head[:8] == b"\x89PNG\r\n\x1a\n":
+            return _probe_png(fptr)
+        if head[:2] == b"BM":
+            return _probe_bmp(fptr)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return _probe_webp(fptr)
+    return _probe_pil(path)
+
+
+class ImageInfoCache:
+    def __init__(self, db_path="image_info_cache.sqlite", commit_every=1000):
+        """Persistent ImageInfo cache keyed by (path, mtime, file size)
+        pass db_path=":memory:" for a cache that only lasts for the process
+        """
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS image_info ("
+                          "path TEXT PRIMARY KEY, mtime_ns INTEGER, file_size INTEGER, "
+                          "width INTEGER, height INTEGER, channels INTEGER, orientation INTEGER)")
+        self.commit_every = commit_every
+        self.n_pending = 0
+
+    def get(self, path) -> ImageInfo:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT mtime_ns, file_size, width, height, channels, orientation "
+                                "FROM image_info WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            return ImageInfo(*row[2:])
+
+        info = get_image_info(path)
+        self.conn.execute("INSERT OR REPLACE INTO image_info VALUES (?, ?, ?, ?, ?, ?, ?)",
+                          (path, stat.st_mtime_ns, stat.st_size, *info))
+        self.n_pending += 1
+        if self.n_pending >= self.commit_every:
+            self.commit()
+        return info
+
+    def commit(self):
+        self.conn.commit()
+        self.n_pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,263 @@
+"""
+Benchmark image decoding and encoding over formats, resolutions and thread counts
+
+Decode cases: every installed read_image backend, full and reduced (1/4 size) decodes,
+warm and cold page cache (single thread only, Linux posix_fadvise), single and multi-threaded.
+Encode cases: cv2.imencode quality/compression settings and PIL save options (quality, optimize),
+encoded to memory so disk speed is not measured.
+Per call latency percentiles and throughput are printed and saved as JSON or CSV.
+
+By default synthetic photo-like images are generated for each format and resolution,
+pass --images to benchmark your own files instead.
+
+Sample Usage:
+    python image_io_bench.py
+    python image_io_bench.py -f .jpg .webp -s 640x480 4000x3000 -r 20 -o bench_results/image_io_bench.csv
+    python image_io_bench.py --images a.jpg b.png --threads 1 4 8
+"""
+import os
+import io
+import sys
+import csv
+import json
+import time
+import tempfile
+import platform
+import argparse
+import os.path as osp
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from image_info import get_image_info
+from image_reader import cv2, pyvips, Image, read_image, available_backends
+
+
+FORMATS = [".jpg", ".png", ".webp"]
+RESOLUTIONS = ["640x480", "1920x1080", "4000x3000"]
+PERCENTILES = [50, 90, 99]
+FIELDS = ["task", "format", "width", "height", "backend", "variant", "cache", "threads",
+          "calls", "bytes", *[f"p{p}_ms" for p in PERCENTILES], "mean_ms", "images_s"]
+
+
+def make_image(width: int, height: int, seed: int = 42) -> np.ndarray:
+    """
+    photo-like (height, width, 3) uint8 RGB image, smooth color regions with mild noise,
+    so that compressed sizes and decode times are closer to real photos than random noise
+    """
+    rng = np.random.default_rng(seed)
+    coarse = rng.random((height // 32 + 2, width // 32 + 2, 3)).astype(np.float32)
+    ys = np.linspace(0, coarse.shape[0] - 1.001, height)
+    xs = np.linspace(0, coarse.shape[1] - 1.001, width)
+    y0, x0 = ys.astype(int), xs.astype(int)
+    fy, fx = (ys - y0)[:, None, None], (xs - x0)[None, :, None]
+    # bilinear upsampling of the coarse grid
+    img = (coarse[y0][:, x0] * (1 - fy) * (1 - fx) + coarse[y0 + 1][:, x0] * fy * (1 - fx)
+           + coarse[y0][:, x0 + 1] * (1 - fy) * fx + coarse[y0 + 1][:, x0 + 1] * fy * fx)
+    img = img * 235 + rng.normal(0, 4, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def get_encoders() -> dict:
+    """
+    returns {(backend, format, variant): encode_func} taking an RGB image and returning bytes
+    """
+    encoders = {}
+    if cv2 is not None:
+        cv2_params = {".jpg": {"q75": [cv2.IMWRITE_JPEG_QUALITY, 75],
+                               "q90": [cv2.IMWRITE_JPEG_QUALITY, 90],
+                               "q95": [cv2.IMWRITE_JPEG_QUALITY, 95]},
+                      ".png": {"c1": [cv2.IMWRITE_PNG_COMPRESSION, 1],
+                               "c3": [cv2.IMWRITE_PNG_COMPRESSION, 3],
+                               "c9": [cv2.IMWRITE_PNG_COMPRESSION, 9]},
+                      ".webp": {"q80": [cv2.IMWRITE_WEBP_QUALITY, 80],
+                                "q95": [cv2.IMWRITE_WEBP_QUALITY, 95]}}
+        for fmt, variants in cv2_params.items():
+            for variant, params in variants.items():
+                encoders[("opencv", fmt, variant)] = (
+                    lambda img, fmt=fmt, params=params:
+                    cv2.imencode(fmt, img[..., ::-1], params)[1].tobytes())
+    if Image is not None:
+        pil_params = {".jpg": {"q90": {"quality": 90},
+                               "q90_optimize": {"quality": 90, "optimize": True}},
+                      ".png": {"default": {}, "optimize": {"optimize": True}},
+                      ".webp": {"q80": {"quality": 80}, "q80_m6": {"quality": 80, "method": 6}}}
+        pil_formats = {".jpg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+        for fmt, variants in pil_params.items():
+            for variant, params in variants.items():
+                def _encode(img, fmt=fmt, params=params):
+                    buf = io.BytesIO()
+                    Image.fromarray(img).save(buf, pil_formats[fmt], **params)
+                    return buf.getvalue()
+                encoders[("pil", fmt, variant)] = _encode
+    return encoders
+
+
+def drop_page_cache(path: str) -> bool:
+    """
+    evict a file from the OS page cache, returns False if not supported on this platform
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def time_calls(func, calls: int, threads: int = 1, before=None) -> dict:
+    """
+    run func calls times over threads threads, before is called untimed ahead of each call
+    returns the per call latency percentiles in ms and the overall calls per second
+    """
+    def _timed(_):
+        if before is not None:
+            before()
+        t1 = time.perf_counter()
+        func()
+        return time.perf_counter() - t1
+
+    t_start = time.perf_counter()
+    if threads == 1:
+        times = [_timed(i) for i in range(calls)]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            times = list(executor.map(_timed, range(calls)))
+    wall = time.perf_counter() - t_start
+    times_ms = np.array(times) * 1000
+    stats = {f"p{p}_ms": float(np.percentile(times_ms, p)) for p in PERCENTILES}
+    stats["mean_ms"] = float(times_ms.mean())
+    # cold cache runs include the untimed evictions in wall time, use the latencies instead
+    stats["images_s"] = calls / (wall if before is None else times_ms.sum() / 1000)
+    return stats
+
+
+def bench_decode(path: str, repeat: int, thread_counts, backends) -> list:
+    info = get_image_info(path)
+    width, height = info.oriented_size
+    fmt = osp.splitext(path)[-1].lower()
+    base = {"task": "decode", "format": fmt, "width": width, "height": height,
+            "bytes": osp.getsize(path)}
+    results = []
+    for backend in backends:
+        for variant, target_size in (("full", None), ("reduced", (width // 4, height // 4))):
+            def _read():
+                read_image(path, target_size, backend=backend)
+            try:
+                _read()  # warm up, also checks that the backend supports the format
+            except Exception as excep:
+                print(f"Skipping {backend} {variant} decode of {path}: {excep}")
+                continue
+            cases = [("warm", threads, None) for threads in thread_counts]
+            if drop_page_cache(path):
+                cases.insert(0, ("cold", 1, lambda: drop_page_cache(path)))
+            for cache, threads, before in cases:
+                stats = time_calls(_read, repeat * threads, threads, before)
+                results.append({**base, "backend": backend, "variant": variant,
+                                "cache": cache, "threads": threads,
+                                "calls": repeat * threads, **stats})
+    return results
+
+
+def bench_encode(img: np.ndarray, fmt: str, repeat: int, encoders: dict) -> list:
+    results = []
+    for (backend, enc_fmt, variant), encode_func in encoders.items():
+        if enc_fmt != fmt:
+            continue
+        n_bytes = len(encode_func(img))  # warm up
+        stats = time_calls(lambda: encode_func(img), repeat)
+        results.append({"task": "encode", "format": fmt, "width": img.shape[1],
+                        "height": img.shape[0], "backend": backend, "variant": variant,
+                        "cache": "", "threads": 1, "calls": repeat, "bytes": n_bytes, **stats})
+    return results
+
+
+def save_results(results: list, meta: dict, output: str) -> None:
+    os.makedirs(osp.dirname(output) or ".", exist_ok=True)
+    if output.endswith(".csv"):
+        with open(output, "w", newline="", encoding="utf-8") as fptr:
+            writer = csv.DictWriter(fptr, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(output, "w", encoding="utf-8") as fptr:
+            json.dump({"meta": meta, "results": results}, fptr, indent=4)
+    print(f"Results saved to {output}")
+
+
+def parse_args():
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Benchmark image decoding and encoding")
+    parser.add_argument("-f", "--formats", nargs="+", default=FORMATS, choices=FORMATS,
+                        help="Formats of the synthetic images (default: %(default)s)")
+    parser.add_argument("-s", "--sizes", nargs="+", default=RESOLUTIONS,
+                        help="WIDTHxHEIGHT of the synthetic images (default: %(default)s)")
+    parser.add_argument("-i", "--images", nargs="+", default=None,
+                        help="Benchmark decoding these images instead of synthetic ones")
+    parser.add_argument("-b", "--backends", nargs="+", default=available_backends(),
+                        choices=available_backends(),
+                        help="Decoding backends (default: %(default)s)")
+    parser.add_argument("-t", "--threads", nargs="+", type=int,
+                        default=sorted({1, cpu_count}),
+                        help="Thread counts of the decode runs (default: %(default)s)")
+    parser.add_argument("-r", "--repeat", type=int, default=10,
+                        help="Timed calls per measurement and thread (default: %(default)s)")
+    parser.add_argument("-o", "--output", default=osp.join("bench_results", "image_io_bench.json"),
+                        help="Path to the .json or .csv results (default: %(default)s)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if pyvips is not None:
+        pyvips.cache_set_max(0)  # libvips caches loads by file name, repeat reads would be free
+    results = []
+    encoders = get_encoders()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = args.images
+        if paths is None:
+            paths = []
+            for size in args.sizes:
+                width, height = map(int, size.lower().split("x"))
+                img = make_image(width, height)
+                for fmt in args.formats:
+                    encode_key = next((key for key in encoders if key[1] == fmt), None)
+                    if encode_key is None:
+                        print(f"No encoder installed for {fmt}, skipping")
+                        continue
+                    path = osp.join(tmp_dir, f"image_{width}x{height}{fmt}")
+                    with open(path, "wb") as fptr:
+                        fptr.write(encoders[encode_key](img))
+                        fptr.flush()
+                        os.fsync(fptr.fileno())  # dirty pages can not be evicted for cold runs
+                    paths.append(path)
+                    results.extend(bench_encode(img, fmt, args.repeat, encoders))
+        for path in paths:
+            results.extend(bench_decode(path, args.repeat, args.threads, args.backends))
+
+    print(f"{'task':>6} {'fmt':>5} {'size':>11} {'backend':>8} {'variant':>12} {'cache':>5} "
+          f"{'thr':>3} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'img/s':>9}")
+    for res in results:
+        print(f"{res['task']:>6} {res['format']:>5} {res['width']:>5}x{res['height']:<5} "
+              f"{res['backend']:>8} {res['variant']:>12} {res['cache']:>5} {res['threads']:>3} "
+              f"{res['p50_ms']:>9.2f} {res['p90_ms']:>9.2f} {res['p99_ms']:>9.2f} "
+              f"{res['images_s']:>9.1f}")
+
+    meta = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "opencv": getattr(cv2, "__version__", None),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+    }
+    save_results(results, meta, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Image reading with pluggable decoding backends (OpenCV, libvips, PIL, imageio)
+
+When a target_size is given, backends that can decode JPEGs at reduced resolution do so
+(PIL draft, libvips shrink-on-load, OpenCV IMREAD_REDUCED_*) before resizing to the exact size,
+which is several times faster than a full decode followed by a resize.
+All backends apply the EXIF orientation, so the output does not depend on the backend.
+read_vips_region reads a crop of an image with libvips without decoding the whole image.
+
+Backends are optional dependencies, only the installed ones are used.
+Without an explicit backend, the backend picked by calibrate_backend for the file extension is used,
+otherwise the first available backend in BACKEND_PRIORITY.
+
+Sample Usage:
+    from image_reader import read_image
+
+    img = read_image("image.jpg")                                # (H, W, 3) RGB uint8
+    img = read_image("image.jpg", target_size=(640, 480), mode="BGR")
+    calibrate_backend("image.jpg", target_size=(640, 480))       # pick the fastest backend
+    crop = read_vips_region("huge.tif", (x, y, w, h), access="random")  # (h, w, bands)
+"""
+import time
+import warnings
+import os.path as osp
+from typing import Optional, Tuple
+
+import numpy as np
+
+from image_info import get_image_info
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+try:
+    import pyvips
+except ImportError:
+    pyvips = None
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+try:
+    import imageio
+except ImportError:
+    imageio = None
+
+
+MODES = {"RGB", "BGR", "L"}
+# libvips band format: numpy dtype
+VIPS_DTYPES = {"uchar": np.uint8, "char": np.int8, "ushort": np.uint16, "short": np.int16,
+               "uint": np.uint32, "int": np.int32, "float": np.float32, "double": np.float64}
+# fastest first, from read_image_test.py benchmarks
+BACKEND_PRIORITY = {"full": ["opencv", "vips", "pil", "imageio"],
+                    "reduced": ["vips", "pil", "opencv", "imageio"]}
+# (extension, "full"/"reduced") -> backend name set by calibrate_backend
+_CALIBRATED = {}
+
+
+def _to_mode(arr: np.ndarray, src_mode: str, mode: str) -> np.ndarray:
+    """
+    convert a decoded uint8 array between RGB, BGR and L modes
+    """
+    if src_mode == mode:
+        return arr
+    if mode == "L":
+        arr = arr if src_mode == "RGB" else arr[..., ::-1]
+        return np.dot(arr, np.array([0.299, 0.587, 0.114])).round().astype(np.uint8)
+    if src_mode == "L":
+        return np.repeat(arr[..., None], 3, axis=2)
+    return np.ascontiguousarray(arr[..., ::-1])  # RGB <-> BGR
+
+
+def _opencv_reduced_flag(path: str, target_size, mode: str) -> int:
+    """
+    largest IMREAD_REDUCED_* decode that is still at least target_size
+    """
+    full_flag = cv2.IMREAD_GRAYSCALE if mode == "L" else cv2.IMREAD_COLOR
+    if target_size is None:
+        return full_flag
+    width, height = get_image_info(path).oriented_size
+    for factor in (8, 4, 2):
+        if width // factor >= target_size[0] and height // factor >= target_size[1]:
+            kind = "GRAYSCALE" if mode == "L" else "COLOR"
+            return getattr(cv2, f"IMREAD_REDUCED_{kind}_{factor}")
+    return full_flag
+
+
+def read_opencv(path: str, target_size=None, mode: str = "RGB") -> np.ndarray:
+    img = cv2.imread(path, _opencv_reduced_flag(path, target_size, mode))
+    if img is None:
+        raise IOError(f"OpenCV could not read {path}")
+    if target_size is not None and (img.shape[1], img.shape[0]) != tuple(target_size):
+        img = cv2.resize(img, tuple(target_size), interpolation=cv2.INTER_AREA)
+    return _to_mode(img, "L" if mode == "L" else "BGR", mode)
+
+
+def vips_to_numpy(image) -> np.ndarray:
+    """
+    render a pyvips image into a writable (H, W, bands) array of the matching dtype
+    recent pyvips return the buffer rendered by libvips and the array is a view of it without a copy,
+    older pyvips return an immutable bytes copy which is copied once more to be writable
+    """
+    if image.format not in VIPS_DTYPES:
+        raise TypeError(f"{image.format} vips band format is not supported")
+    img = np.ndarray(buffer=image.write_to_memory(), dtype=VIPS_DTYPES[image.format],
+                     shape=(image.height, image.width, image.bands))
+    return img if img.flags.writeable else img.copy()
+
+
+def read_vips(path: str, target_size=None, mode: str = "RGB") -> np.ndarray:
+    if target_size is not None:
+        # thumbnail uses shrink-on-load for JPEGs and resizes to the exact size
+        image = pyvips.Image.thumbnail(path, target_size[0], height=target_size[1], size="force")
+    else:
+        image = pyvips.Image.new_from_file(path, access="sequential")
+        if image.get_typeof("orientation") and image.get("orientation") != 1:
+            # rotating reads rows out of order, which sequential access does not allow
+            image = pyvips.Image.new_from_file(path).autorot()
+    if image.hasalpha():
+        image = image.flatten()
+    image = image.colourspace("srgb").cast("uchar")
+    return _to_mode(vips_to_numpy(image), "RGB", mode)
+
+
+def read_vips_region(path: str, box, target_size=None, access: str = "sequential") -> np.ndarray:
+    """
+    read the box region of an image with all its bands (alpha included) and its original dtype
+        box: (x, y, width, height) of the region in the image
+        target_size: optional (width, height) the region is resized to
+        access: "sequential" streams the image top to bottom keeping only a few scanlines in memory,
+                use "random" for tiled TIFFs so that only the tiles overlapping the box are read
+    returns a writable (H, W, bands) array
+    """
+    image = pyvips.Image.new_from_file(path, access=access)
+    image = image.crop(*box)  # lazy, only the pixels in box are rendered
+    if target_size is not None:
+        image = image.resize(target_size[0] / image.width, vscale=target_size[1] / image.height)
+    return vips_to_numpy(image)
+
+
+def read_pil(path: str, target_size=None, mode: str = "RGB") -> np.ndarray:
+    pil_mode = "L" if mode == "L" else "RGB"
+    with Image.open(path) as im:
+        if target_size is not None:
+            im.draft(pil_mode, tuple(target_size))  # reduced JPEG decode, no-op for other formats
+        im = ImageOps.exif_transpose(im).convert(pil_mode)
+        if target_size is not None and im.size != tuple(target_size):
+            im = im.resize(tuple(target_size), Image.BILINEAR)
+        img = np.asarray(im)
+    return _to_mode(img, pil_mode, mode)
+
+
+def _exif_transpose(arr: np.ndarray, orientation: int) -> np.ndarray:
+    """
+    numpy equivalent of PIL ImageOps.exif_transpose for a decoded (H, W[, C]) array
+    """
+    if orientation in (2, 4, 5, 7):  # mirrored orientations
+        arr = arr[:, ::-1]
+    rotations = {3: 2, 4: 2, 5: 1, 6: 3, 7: 3, 8: 1}  # counter-clockwise 90 deg turns
+    return np.ascontiguousarray(np.rot90(arr, rotations.get(orientation, 0)))
+
+
+def _imageio_to_mode(img: np.ndarray, pil_mode: str) -> np.ndarray:
+    """
+    convert an array decoded without pilmode (e.g. by the tifffile plugin) to a uint8 L or RGB array
+    """
+    if img.dtype == np.uint16:
+        img = (img >> 8).astype(np.uint8)
+    elif img.dtype != np.uint8:
+        raise TypeError(f"{img.dtype} images are not supported by the imageio backend")
+    if img.ndim == 3 and img.shape[2] == 1:
+        img = img[..., 0]
+    elif img.ndim == 3 and img.shape[2] == 4:
+        img = img[..., :3]  # alpha is dropped as with PIL convert("RGB")
+    return _to_mode(img, "L" if img.ndim == 2 else "RGB", pil_mode)
+
+
+def read_imageio(path: str, target_size=None, mode: str = "RGB") -> np.ndarray:
+    pil_mode = "L" if mode == "L" else "RGB"
+    try:
+        img = np.asarray(imageio.imread(path, pilmode=pil_mode))
+    except TypeError:  # imageio v3 plugins other than pillow, e.g. tifffile, take no pilmode
+        img = _imageio_to_mode(np.asarray(imageio.imread(path)), pil_mode)
+    img = _exif_transpose(img, get_image_info(path).orientation)
+    if target_size is not None and (img.shape[1], img.shape[0]) != tuple(target_size):
+        img = np.asarray(Image.fromarray(img).resize(tuple(target_size), Image.BILINEAR))
+    return _to_mode(img, pil_mode, mode)
+
+
+BACKENDS = {"opencv": (read_opencv, cv2),
+            "vips": (read_vips, pyvips),
+            "pil": (read_pil, Image),
+            "imageio": (read_imageio, imageio if Image is not None else None)}
+
+
+def available_backends() -> list:
+    return [name for name, (_, module) in BACKENDS.items() if module is not None]
+
+
+def _default_backend(path: str, target_size) -> str:
+    kind = "full" if target_size is None else "reduced"
+    ext = osp.splitext(path)[-1].lower()
+    if (ext, kind) in _CALIBRATED:
+        return _CALIBRATED[(ext, kind)]
+    available = available_backends()
+    for name in BACKEND_PRIORITY[kind]:
+        if name in available:
+            return name
+    raise ImportError("No image decoding backend installed, install one of opencv-python, pyvips, Pillow")
+
+
+def read_image(path: str,
+               target_size: Optional[Tuple[int, int]] = None,
+               mode: str = "RGB",
+               backend: Optional[str] = None) -> np.ndarray:
+    """
+    read an image into a uint8 array of shape (H, W, 3) for RGB/BGR or (H, W) for L
+        target_size: (width, height) of the output, uses reduced resolution decoding when possible
+        mode: RGB, BGR (for use with cv2 funcs) or L (grayscale)
+        backend: one of BACKENDS, defaults to the calibrated or first available backend
+    """
+    if mode not in MODES:
+        raise ValueError(f"{mode} mode is not supported, use one of {MODES}")
+    backend = backend or _default_backend(str(path), target_size)
+    read_func, module = BACKENDS[backend]
+    if module is None:
+        raise ImportError(f"{backend} backend is not installed")
+    return read_func(str(path), target_size=target_size, mode=mode)
+
+
+def calibrate_backend(sample_path: str, target_size=None, mode: str = "RGB", repeat: int = 5) -> str:
+    """
+    time all available backends on a representative sample image and use the fastest
+    as the default for files with the same extension and target_size kind (full/reduced)
+    returns the name of the fastest backend
+    """
+    timings = {}
+    for name in available_backends():
+        try:
+            read_image(sample_path, target_size, mode, backend=name)  # warm up
+        except Exception as excep:
+            warnings.warn(f"{name} backend failed on {sample_path}: {excep}")
+            continue
+        t1 = time.perf_counter()
+        for _ in range(repeat):
+            read_image(sample_path, target_size, mode, backend=name)
+        timings[name] = (time.perf_counter() - t1) / repeat
+    if not timings:
+        raise IOError(f"No backend could read {sample_path}")
+    fastest = min(timings, key=timings.get)
+    kind = "full" if target_size is None else "reduced"
+    _CALIBRATED[(osp.splitext(str(sample_path))[-1].lower(), kind)] = fastest
+    return fastest
@@ -1,10 +1,15 @@
 import timeit
+import tempfile
+import os.path as osp
 
 import cv2
 import pyvips
 import imageio
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageOps
+
+from image_info import get_image_info
+from image_reader import vips_to_numpy, read_image, available_backends
 
 
 def usingPIL(f):
@@ -25,10 +30,15 @@ def usingOpenCV(f):
 def usingVIPS(f):
     image = pyvips.Image.new_from_file(f, access="sequential")
     image = image.colourspace("srgb")
-    mem_img = image.write_to_memory()
-    imgnp = np.frombuffer(mem_img, dtype=np.uint8).reshape(
-        image.height, image.width, 3)
-    return imgnp
+    # (H, W, bands) view of the rendered buffer, keeps alpha if present
+    return vips_to_numpy(image)
+
+
+def usingVIPSCrop(f):
+    # only the center quarter is rendered, the rows below it are never decoded
+    image = pyvips.Image.new_from_file(f, access="sequential")
+    image = image.crop(image.width // 4, image.height // 4, image.width // 2, image.height // 2)
+    return vips_to_numpy(image.colourspace("srgb"))
 
 
 def usingPILandShrink(f):
@@ -40,22 +50,52 @@ def usingPILandShrink(f):
 def usingVIPSandShrink(f):
     image = pyvips.Image.new_from_file(f, access="sequential", shrink=4)
     image = image.colourspace("srgb")
-    mem_img = image.write_to_memory()
-    imgnp = np.frombuffer(mem_img, dtype=np.uint8).reshape(
-        image.height, image.width, 3)
-    return imgnp
-
-
-def bench(name):
+    return vips_to_numpy(image)
+
+
+def check_exif_orientation():
+    """All read_image backends must apply the EXIF orientation and agree on the output
+    """
+    img = np.random.default_rng(0).integers(0, 256, (11, 8, 3), dtype=np.uint8)
+    # smooth image so that JPEG and the reduced decodes differ little, a wrong rotation differs a lot
+    cases = [(".jpg", 6), (".webp", 6)] + [(".png", orientation) for orientation in range(2, 9)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for ext, orientation in cases:
+            path = osp.join(tmp_dir, f"rotated{orientation}{ext}")
+            im = Image.fromarray(cv2.resize(img, (370, 530), interpolation=cv2.INTER_CUBIC))
+            exif = im.getexif()
+            exif[0x0112] = orientation  # e.g. 6: stored upright, displayed rotated by 90 deg clockwise
+            im.save(path, exif=exif, quality=95)
+            assert get_image_info(path).orientation == orientation, f"orientation not probed from {ext}"
+            with Image.open(path) as im:
+                expected = np.asarray(ImageOps.exif_transpose(im).convert("RGB"), dtype=np.float32)
+            for target_size in (None, (106, 74)):
+                reads = {backend: read_image(path, target_size, backend=backend).astype(np.float32)
+                         for backend in available_backends()}
+                ref_backend, ref = next(iter(reads.items()))
+                if target_size is None:
+                    ref_backend, ref = "PIL exif_transpose", expected
+                for backend, arr in reads.items():
+                    assert arr.shape == ref.shape, \
+                        f"{backend} {arr.shape} != {ref_backend} {ref.shape} on {ext} {orientation} {target_size}"
+                    diff = np.abs(arr - ref).mean()
+                    assert diff < 8, f"{backend} differs from {ref_backend} by {diff:.1f} on {ext} {orientation}"
+    print("EXIF orientation: all backends agree")
+
+
+def bench(name, number=10):
     result = timeit.timeit(f"using{name}('image.jpg')",
                            setup=f"from __main__ import using{name}",
-                           number=10)
-    print(f"using{name}: {result * 10} ms")
+                           number=number)
+    # timeit returns the total seconds of all calls
+    print(f"using{name}: {result / number * 1000:.2f} ms per call")
 
 
+check_exif_orientation()
 bench("PIL")
 bench("ImageIO")
 bench("OpenCV")
 bench("VIPS")
+bench("VIPSCrop")
 bench("PILandShrink")
 bench("VIPSandShrink")
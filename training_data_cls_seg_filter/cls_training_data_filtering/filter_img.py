@@ -1,7 +1,13 @@
 import pandas as pd
 import argparse
 import cv2
+import sys
 import os
+import os.path as osp
+
+sys.path.append(osp.join(osp.dirname(osp.abspath(__file__)), "..", "..", "image_io_utils"))
+from image_reader import read_image  # noqa: E402
+from image_cache import add_cache_args, image_cache_from_args  # noqa: E402
 
 
 def load_existing_records(f):
@@ -32,7 +38,8 @@ def append_to_file(seen: dict, f):
         file.write(res)
 
 
-def tag_images(csv_save_path, img_root):
+def tag_images(csv_save_path, img_root, image_cache=None):
+    read = image_cache.read if image_cache is not None else read_image
     seen_from_file = load_existing_records(csv_save_path)
 
     seen = {}
@@ -53,7 +60,7 @@ def tag_images(csv_save_path, img_root):
         if img_path is None:
             break
 
-        img = cv2.imread(img_path)
+        img = read(img_path, mode="BGR")
 
         if img_path in seen:
             if seen[img_path] == 0:
@@ -100,8 +107,10 @@ def main():
                         help='root path of orig images', default="sample_data/img_orig")
     parser.add_argument('-s', '--csv_save_path', type=str,
                         help='path to save csv file', default="sample_data/filtered_data.csv")
+    add_cache_args(parser)
     args = parser.parse_args()
-    tag_images(args.csv_save_path, args.img_root)
+    image_cache = image_cache_from_args(args, output_dir=osp.dirname(args.csv_save_path))
+    tag_images(args.csv_save_path, args.img_root, image_cache)
 
 
 if __name__ == '__main__':
@@ -2,7 +2,13 @@ import numpy as np
 import pandas as pd
 import argparse
 import cv2
+import sys
 import os
+import os.path as osp
+
+sys.path.append(osp.join(osp.dirname(osp.abspath(__file__)), "..", "..", "image_io_utils"))
+from image_reader import read_image  # noqa: E402
+from image_cache import add_cache_args, image_cache_from_args  # noqa: E402
 
 
 def load_existing_records(f):
@@ -43,7 +49,8 @@ def append_to_file(seen: dict, f):
         file.write(res)
 
 
-def tag_images(f, clip_root, matting_root):
+def tag_images(f, clip_root, matting_root, image_cache=None):
+    read = image_cache.read if image_cache is not None else read_image
     seen_from_file = load_existing_records(f)
     seen = {}
     seen_clips, seen_mattings = [], []
@@ -65,7 +72,7 @@ def tag_images(f, clip_root, matting_root):
         if clip_path is None:
             break
 
-        clip_img = cv2.imread(clip_path)
+        clip_img = read(clip_path, mode="BGR")
         try:
             mask = cv2.imread(matting_path, cv2.IMREAD_UNCHANGED)[:, :, 3]
         except Exception as e:
@@ -124,8 +131,10 @@ def main():
                         help='root path of seg/matting images', default="sample_data/seg_orig")
     parser.add_argument('-s', '--csv_save_path', type=str,
                         help='path to save csv file', default="sample_data/filtered_data.csv")
+    add_cache_args(parser)
     args = parser.parse_args()
-    tag_images(args.csv_save_path, args.clip_root, args.matting_root)
+    image_cache = image_cache_from_args(args, output_dir=osp.dirname(args.csv_save_path))
+    tag_images(args.csv_save_path, args.clip_root, args.matting_root, image_cache)
 
 
 if __name__ == '__main__':
@@ -2,7 +2,13 @@ import numpy as np
 import pandas as pd
 import argparse
 import cv2
+import sys
 import os
+import os.path as osp
+
+sys.path.append(osp.join(osp.dirname(osp.abspath(__file__)), "..", "..", "image_io_utils"))
+from image_reader import read_image  # noqa: E402
+from image_cache import add_cache_args, image_cache_from_args  # noqa: E402
 
 
 def load_existing_records(f):
@@ -45,7 +51,8 @@ def write_to_file(seen: dict, f):
         file.write(res)
 
 
-def tag_images(pre_filtered_path, save_path, clip_root, matting_root):
+def tag_images(pre_filtered_path, save_path, clip_root, matting_root, image_cache=None):
+    read = image_cache.read if image_cache is not None else read_image
     seen_from_pref_file = load_existing_records(pre_filtered_path)
     seen = {}
     seen_clips, seen_mattings = [], []
@@ -83,7 +90,7 @@ def tag_images(pre_filtered_path, save_path, clip_root, matting_root):
         if clip_path_orig is None:
             break
 
-        clip_img = cv2.imread(clip_path_orig)
+        clip_img = read(clip_path_orig, mode="BGR")
         try:
             mask = cv2.imread(matting_path_orig, cv2.IMREAD_UNCHANGED)[:, :, 3]
         except Exception as e:
@@ -144,11 +151,14 @@ def main():
                         help='path to pre-filtered csv file', default="sample_data/filtered_data.csv")
     parser.add_argument('-s', '--csv_save_path', type=str,
                         help='path to save csv file', default="sample_data/final_filtered_data.csv")
+    add_cache_args(parser)
     args = parser.parse_args()
+    image_cache = image_cache_from_args(args, output_dir=osp.dirname(args.csv_save_path))
     tag_images(args.csv_filter_path,
                args.csv_save_path,
                args.clip_root,
-               args.matting_root)
+               args.matting_root,
+               image_cache)
 
 
 if __name__ == '__main__':
@@ -1,7 +1,12 @@
 import pandas as pd
 import argparse
 import cv2
+import sys
 import os
+import os.path as osp
+
+sys.path.append(osp.join(osp.dirname(osp.abspath(__file__)), "..", "..", "image_io_utils"))
+from image_reader import read_image  # noqa: E402
 
 
 def load_existing_records(f):
@@ -43,7 +48,7 @@ def save_images(f, img_root, matting_root):
         img_ok = True if seen_from_file[img_path][1] == 1 else False
         if img_ok:
             i += 1
-            img = cv2.imread(img_path)
+            img = read_image(img_path, mode="BGR")
             try:
                 mask = cv2.imread(matting_path, cv2.IMREAD_UNCHANGED)[:, :, 3]
             except Exception as e: